@@ -7,3 +7,10 @@ IMAGE_UPLOAD_RECIPE = "recipes/"
 MIN_COOK_TIME = 1
 MIN_AMOUNT = 1
 SIZE_PAGE = 6
+MAX_BULK_RECIPES = 100
+MAX_SIMILAR_RECIPES = 50
+IMAGE_SIZES = {"thumbnail": 160, "card": 480, "full": 1280}
+IMAGE_FORMATS = ("webp", "jpeg")
+IMAGE_TYPES = ("png", "jpeg", "gif", "webp")
+IMAGE_SNIFF_BYTES = 12
+BASE64_CHUNK = 64 * 1024
@@ -1,30 +1,76 @@
-from django_filters import (NumberFilter, CharFilter, FilterSet,
-                            ModelMultipleChoiceFilter)
-from recipes.models import Ingredient, Recipe, Tag
+from django.db.models import Exists, OuterRef
+from django_filters import (BaseInFilter, CharFilter, FilterSet,
+                            ModelMultipleChoiceFilter, NumberFilter,
+                            RangeFilter)
+from recipes.indexes.search import get_backend as get_search_backend
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag, TagInRecipe)
+
+
+class NumberInFilter(BaseInFilter, NumberFilter):
+    """Список чисел через запятую: ?authors=1,2,3."""
 
 
 class RecipeInlineFilter(FilterSet):
-    author = NumberFilter(field_name="author__id")
+    """
+    Все условия по связанным таблицам — EXISTS-подзапросы, а не JOIN:
+    строки рецептов не размножаются и DISTINCT не нужен.
+    """
+    author = NumberFilter(field_name="author_id")
+    authors = NumberInFilter(field_name="author_id")
     tags = ModelMultipleChoiceFilter(
-        field_name="tags__slug",
         to_field_name="slug",
         queryset=Tag.objects.all(),
+        method="filter_tags",
     )
+    ingredients = NumberInFilter(method="filter_ingredients")
+    exclude_ingredients = NumberInFilter(method="filter_exclude_ingredients")
+    cooking_time = RangeFilter()
     is_favorited = NumberFilter(method="filter_favorited")
     is_in_shopping_cart = NumberFilter(method="filter_in_cart")
+    search = CharFilter(method="filter_search")
 
     class Meta:
         model = Recipe
-        fields = ["author", "tags", "is_favorited", "is_in_shopping_cart"]
+        fields = ["author", "authors", "tags", "ingredients",
+                  "exclude_ingredients", "cooking_time",
+                  "is_favorited", "is_in_shopping_cart", "search"]
+
+    def filter_search(self, queryset, name, value):
+        """Поиск по словам; результаты упорядочены по релевантности."""
+        if not value.strip():
+            return queryset
+        return get_search_backend().filter(queryset, value)
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(TagInRecipe.objects.filter(
+            tag_id__in=[tag.id for tag in value], recipe_id=OuterRef("pk"))))
+
+    def filter_ingredients(self, queryset, name, value):
+        """Рецепты, в которых есть все перечисленные ингредиенты."""
+        for pk in set(value):
+            queryset = queryset.filter(Exists(RecipeIngredient.objects.filter(
+                ingredient_id=pk, recipe_id=OuterRef("pk"))))
+        return queryset
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.exclude(Exists(RecipeIngredient.objects.filter(
+            ingredient_id__in=value, recipe_id=OuterRef("pk"))))
 
     def filter_favorited(self, queryset, name, value):
         if value == 1 and self.request.user.is_authenticated:
-            return queryset.filter(in_favorites__user=self.request.user)
+            return queryset.filter(Exists(Favorite.objects.filter(
+                user=self.request.user, recipe_id=OuterRef("pk"))))
         return queryset
 
     def filter_in_cart(self, queryset, name, value):
         if value == 1 and self.request.user.is_authenticated:
-            return queryset.filter(in_carts__user=self.request.user)
+            return queryset.filter(Exists(ShoppingCart.objects.filter(
+                user=self.request.user, recipe_id=OuterRef("pk"))))
         return queryset
 
 
@@ -0,0 +1,161 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from config.db_router import primary
+from config.middleware import measure_serializer
+from recipes.cache import count, get_version
+
+
+class SerializerMetricsMixin:
+    """
+    Время serializer.data попадает в метрики запроса отдельно
+    от времени view (RequestMetricsMiddleware). Данные ответа
+    получаются через serialize(): стандартные действия DRF
+    переопределены здесь, собственные действия вызывают его сами.
+    Миксин ставится после миксинов, оборачивающих list и retrieve
+    (кеш, условный GET): его действия не вызывают super().
+    """
+
+    def serialize(self, serializer):
+        with measure_serializer():
+            return serializer.data
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                self.serialize(self.get_serializer(page, many=True)))
+        return Response(
+            self.serialize(self.get_serializer(queryset, many=True)))
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_object())
+        return Response(self.serialize(serializer))
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        data = self.serialize(serializer)
+        return Response(data, status=status.HTTP_201_CREATED,
+                        headers=self.get_success_headers(data))
+
+    def update(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = self.get_serializer(
+            instance, data=request.data, partial=kwargs.pop("partial", False))
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        if getattr(instance, "_prefetched_objects_cache", None):
+            instance._prefetched_objects_cache = {}
+        return Response(self.serialize(serializer))
+
+
+class AnonymousCacheMixin:
+    """
+    Кеширует ответы list/retrieve для анонимных пользователей.
+    Ключ включает версию семейства cache_family, которую сигналы
+    увеличивают при изменении данных.
+    """
+    cache_family = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
+
+    def cached(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        url = hashlib.md5(
+            request.build_absolute_uri().encode()).hexdigest()
+        key = "api:{}:{}:{}".format(
+            self.cache_family, get_version(self.cache_family), url)
+        data = cache.get(key)
+        if data is not None:
+            count(f"{self.cache_family}:hits")
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+        count(f"{self.cache_family}:misses")
+        with primary():
+            response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+        response["X-Cache"] = "MISS"
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Отдаёт ETag и Last-Modified для list/retrieve и отвечает 304
+    до сериализации. Валидатор строится из версий cache_family
+    и get_validator_versions() и полного пути запроса; для карточки
+    к ним добавляются MAX(last_modified_field) и число строк.
+
+    Список валидируется только версиями, без запроса к БД: его
+    содержимое меняется лишь вместе с версией cache_family, которую
+    сигналы поднимают при любом изменении данных.
+    """
+    last_modified_field = "updated"
+
+    def get_validator_versions(self, request):
+        return []
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(
+            super().list, None, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.queryset.filter(
+                **{self.lookup_field: kwargs[lookup]})
+        except (TypeError, ValueError, ValidationError):
+            # Как get_object(): id не того типа — это 404, а не 500.
+            raise Http404
+        return self.conditional(
+            super().retrieve, queryset, request, *args, **kwargs)
+
+    def conditional(self, handler, queryset, request, *args, **kwargs):
+        names = self.get_validator_versions(request)
+        if getattr(self, "cache_family", None):
+            names = [self.cache_family, *names]
+        versions = [get_version(name) for name in names]
+        parts = [request.get_full_path(), versions]
+        modified = [datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
+                    for version in versions]
+        if queryset is not None:
+            state = queryset.order_by().aggregate(
+                last_modified=Max(self.last_modified_field),
+                count=Count("pk"))
+            if not state["count"]:
+                return handler(request, *args, **kwargs)
+            parts += [state["last_modified"].isoformat(), state["count"]]
+            modified.append(state["last_modified"])
+        if not modified:
+            return handler(request, *args, **kwargs)
+
+        validator = ":".join(map(str, parts))
+        etag = '"{}"'.format(hashlib.md5(validator.encode()).hexdigest())
+        timestamp = int(max(modified).timestamp())
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(timestamp)
+        return response
@@ -1,9 +1,174 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from api.constants import SIZE_PAGE
 
 
-class DefaultPagination(PageNumberPagination):
+class KeysetPagination(BasePagination):
+    """
+    Постраничный вывод по ключу сортировки (created, id) вместо OFFSET.
+    Не считает COUNT(*), курсоры next/previous непрозрачны для клиента.
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "limit"
+    page_size = SIZE_PAGE
+    invalid_cursor_message = "Некорректный курсор."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        cursor = self.decode_cursor(request, queryset)
+        reverse = cursor is not None and cursor["reverse"]
+
+        ordering = [self.invert(field) for field in self.ordering] \
+            if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            queryset = queryset.filter(
+                self.seek_filter(ordering, cursor["position"]))
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results and (has_more or reverse):
+            self.next_position = self.position(results[-1])
+        if results and (cursor is not None and (not reverse or has_more)):
+            self.previous_position = self.position(results[0])
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_link(self.next_position, reverse=False),
+            "previous": self.get_link(self.previous_position, reverse=True),
+            "results": data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def get_ordering(queryset):
+        ordering = list(queryset.query.order_by
+                        or queryset.model._meta.ordering)
+        if not any(field.lstrip("-") in ("id", "pk") for field in ordering):
+            last_desc = bool(ordering) and ordering[-1].startswith("-")
+            ordering.append("-id" if last_desc else "id")
+        return ordering
+
+    @staticmethod
+    def ordering_fields(queryset, ordering):
+        """Поля модели или аннотации, по которым идёт сортировка."""
+        meta = queryset.model._meta
+        annotations = queryset.query.annotations
+        fields = []
+        for field in ordering:
+            name = field.lstrip("-")
+            if name == "pk":
+                fields.append(meta.pk)
+            elif name in annotations:
+                fields.append(annotations[name].output_field)
+            else:
+                fields.append(meta.get_field(name))
+        return fields
+
+    @staticmethod
+    def seek_filter(ordering, position):
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return condition
+
+    def position(self, obj):
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip("-"))
+            values.append(
+                value.isoformat() if isinstance(value, datetime) else value)
+        return values
+
+    def decode_cursor(self, request, queryset):
+        """
+        Курсор должен соответствовать текущей сортировке: те же поля
+        и значения их типов. Иначе — 404, а не ошибка в запросе к базе.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position = cursor["p"]
+            if (not isinstance(position, list)
+                    or len(position) != len(self.ordering)
+                    or cursor.get("o", self.ordering) != self.ordering):
+                raise ValueError
+            fields = self.ordering_fields(queryset, self.ordering)
+            values = []
+            for field, value in zip(fields, position):
+                if value is None or isinstance(value, (dict, list)):
+                    raise ValueError
+                values.append(field.to_python(value))
+            return {"position": values, "reverse": bool(cursor["r"])}
+        except (TypeError, ValueError, KeyError, AttributeError,
+                ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_link(self, position, reverse):
+        if position is None:
+            return None
+        encoded = base64.urlsafe_b64encode(json.dumps(
+            {"p": position, "r": int(reverse), "o": self.ordering}
+        ).encode()).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+
+class PagePagination(PageNumberPagination):
+    """Постраничный вывод по номеру страницы, в том числе для списков."""
     page_size_query_param = "limit"
     page_query_param = "page"
     page_size = SIZE_PAGE
+
+
+class DefaultPagination(PagePagination):
+    """
+    Постраничный вывод по номеру страницы. Если в запросе передан
+    параметр cursor (в том числе пустой), используется KeysetPagination.
+    """
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,47 @@
+import gzip
+import hashlib
+import json
+import threading
+
+from config.db_router import primary
+from recipes.cache import get_version
+from recipes.models import Ingredient, Tag
+
+_lock = threading.Lock()
+_bundle = None
+
+
+class ReferenceBundle:
+    def __init__(self, versions, raw):
+        self.versions = versions
+        self.raw = raw
+        self.gzipped = gzip.compress(raw, compresslevel=9, mtime=0)
+        self.digest = hashlib.sha256(raw).hexdigest()[:16]
+
+
+def build_bundle(versions):
+    data = {
+        "tags": list(Tag.objects.values("id", "name", "slug")),
+        "ingredients": list(
+            Ingredient.objects.values("id", "name", "measurement_unit")),
+    }
+    raw = json.dumps(
+        data, ensure_ascii=False, separators=(",", ":")).encode()
+    return ReferenceBundle(versions, raw)
+
+
+def get_bundle():
+    """
+    Возвращает сжатый JSON с тегами и ингредиентами. Собирается заново,
+    только когда сигналы сменили версию tags или ingredients.
+    """
+    global _bundle
+    versions = (get_version("tags"), get_version("ingredients"))
+    bundle = _bundle
+    if bundle is not None and bundle.versions == versions:
+        return bundle
+    with _lock:
+        if _bundle is None or _bundle.versions != versions:
+            with primary():
+                _bundle = build_bundle(versions)
+        return _bundle
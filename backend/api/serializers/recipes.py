@@ -1,8 +1,18 @@
+import json
+
+from collections.abc import Mapping
+
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import QueryDict
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
 
+from api.constants import MAX_BULK_RECIPES
 from api.serializers.users import UserResponseSerializer, Base64ImageField
-from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.images import derivative_urls
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingListItem, Tag)
 
 User = get_user_model()
 
@@ -19,20 +29,106 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который получает объекты для всего списка
+    значений одним запросом in_bulk. Сообщения об ошибках те же.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.objects = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_key(self, data):
+        if isinstance(data, bool):
+            raise TypeError
+        return self.get_queryset().model._meta.pk.get_prep_value(data)
+
+    def prefetch(self, values):
+        keys = set()
+        for value in values:
+            try:
+                keys.add(self.to_key(value))
+            except (TypeError, ValueError):
+                continue
+        self.objects = self.get_queryset().in_bulk(keys)
+
+    def to_internal_value(self, data):
+        if self.objects is None:
+            return super().to_internal_value(data)
+        try:
+            obj = self.objects.get(self.to_key(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if obj is None:
+            self.fail("does_not_exist", pk_value=data)
+        return obj
+
+
+class BulkManyRelatedField(ManyRelatedField):
+    def to_internal_value(self, data):
+        if isinstance(data, (list, tuple)):
+            self.child_relation.prefetch(data)
+        return super().to_internal_value(data)
+
+
+class IngredientCreateListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child.fields["id"].prefetch(
+                item.get("id") for item in data if isinstance(item, Mapping))
+        return super().to_internal_value(data)
+
+
 class IngredientCreateSerializer(serializers.Serializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = BulkPrimaryKeyRelatedField(queryset=Ingredient.objects.all())
     amount = serializers.IntegerField(min_value=1)
 
+    class Meta:
+        list_serializer_class = IngredientCreateListSerializer
+
+
+class ImageSizesField(serializers.ReadOnlyField):
+    def to_representation(self, value):
+        urls = derivative_urls(value)
+        if urls is None:
+            return None
+        request = self.context.get("request")
+        if request is not None:
+            for formats in urls.values():
+                for image_format, url in formats.items():
+                    formats[image_format] = request.build_absolute_uri(url)
+        return urls
+
+
+class ImageSizesMixin:
+    """Добавляет поле images при запросе с параметром image_sizes=1."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request and request.query_params.get("image_sizes") == "1":
+            fields["images"] = ImageSizesField(source="image")
+        return fields
+
 
-class RecipeMinifiedSerializer(serializers.ModelSerializer):
+class RecipeMinifiedSerializer(ImageSizesMixin, serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ("id", "name", "image", "cooking_time")
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(ImageSizesMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
-    author = UserResponseSerializer(read_only=True)
+    author = serializers.SerializerMethodField()
     ingredients = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
@@ -54,7 +150,6 @@ class RecipeListSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_ingredients(self, obj):
-        queryset = RecipeIngredient.objects.filter(recipe=obj)
         return [
             {
                 "id": ri.ingredient.id,
@@ -62,23 +157,41 @@ class RecipeListSerializer(serializers.ModelSerializer):
                 "measurement_unit": ri.ingredient.measurement_unit,
                 "amount": ri.amount,
             }
-            for ri in queryset
+            for ri in obj.recipe_ingredients.all()
         ]
 
+    def get_author(self, obj):
+        if hasattr(obj, "is_author_subscribed"):
+            obj.author.is_subscribed = obj.is_author_subscribed
+        return UserResponseSerializer(obj.author, context=self.context).data
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         user = self.context["request"].user
         return obj.in_favorites.filter(
             user=user).exists() if user.is_authenticated else False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         user = self.context["request"].user
         return obj.in_carts.filter(
             user=user).exists() if user.is_authenticated else False
 
 
+class PantryRecipeSerializer(RecipeListSerializer):
+    coverage = serializers.ReadOnlyField()
+    missing = serializers.ReadOnlyField()
+
+    class Meta(RecipeListSerializer.Meta):
+        fields = RecipeListSerializer.Meta.fields + ("coverage", "missing")
+        read_only_fields = fields
+
+
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     ingredients = IngredientCreateSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True)
     image = Base64ImageField(allow_empty_file=False)
 
@@ -87,6 +200,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         fields = ("ingredients", "tags",
                   "image", "cooking_time", "name", "text")
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop("ingredients")
         tags = validated_data.pop("tags")
@@ -105,24 +219,66 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         ])
         return recipe
 
+    def to_internal_value(self, data):
+        if isinstance(data, QueryDict):
+            data = self.parse_multipart(data)
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def parse_multipart(data):
+        """
+        В multipart-запросе ingredients передаются JSON-строкой,
+        а tags — повторяющимся полем.
+        """
+        parsed = data.dict()
+        parsed["tags"] = data.getlist("tags")
+        try:
+            parsed["ingredients"] = json.loads(data.get("ingredients", "[]"))
+        except ValueError:
+            raise serializers.ValidationError(
+                {"ingredients": "Ожидается JSON-список ингредиентов."})
+        return parsed
+
     def to_representation(self, instance):
+        instance = (
+            Recipe.objects.with_related()
+            .with_user_flags(self.context["request"].user)
+            .get(pk=instance.pk)
+        )
         return RecipeListSerializer(
             instance, context=self.context
         ).data
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop("ingredients")
         tags = validated_data.pop("tags")
-        RecipeIngredient.objects.filter(recipe=instance).delete()
         instance.tags.set(tags)
+        existing = {
+            row.ingredient_id: row
+            for row in RecipeIngredient.objects.filter(recipe=instance)
+        }
+        old_amounts = {pk: row.amount for pk, row in existing.items()}
+        new_amounts = {ing["id"].id: ing["amount"] for ing in ingredients}
+
+        removed = old_amounts.keys() - new_amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                pk__in=[existing[pk].pk for pk in removed]).delete()
+        changed = []
+        for pk, amount in new_amounts.items():
+            if pk in existing and existing[pk].amount != amount:
+                existing[pk].amount = amount
+                changed.append(existing[pk])
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ["amount"])
         RecipeIngredient.objects.bulk_create([
-            RecipeIngredient(
-                recipe=instance,
-                ingredient=ing["id"],
-                amount=ing["amount"],
-            )
-            for ing in ingredients
+            RecipeIngredient(recipe=instance, ingredient_id=pk, amount=amount)
+            for pk, amount in new_amounts.items() if pk not in existing
         ])
+
+        ShoppingListItem.objects.update_recipe(
+            instance.id, old_amounts, new_amounts)
         return super().update(instance, validated_data)
 
     def validate(self, data):
@@ -153,6 +309,17 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         return data
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = BulkPrimaryKeyRelatedField(
+        queryset=Recipe.objects.all(), many=True, allow_empty=False)
+
+    def validate_recipes(self, recipes):
+        if len(recipes) > MAX_BULK_RECIPES:
+            raise serializers.ValidationError(
+                f"Не больше {MAX_BULK_RECIPES} рецептов за один запрос.")
+        return recipes
+
+
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     id = serializers.PrimaryKeyRelatedField(
         source='ingredient', queryset=Ingredient.objects.all()
@@ -1,25 +1,113 @@
 import base64
+import binascii
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from rest_framework import serializers
 
+from api.constants import BASE64_CHUNK, IMAGE_SNIFF_BYTES, IMAGE_TYPES
 from users.models import Subscription
 
 User = get_user_model()
 
 
+def get_recipes_limit(request):
+    limit = request.query_params.get('recipes_limit')
+    if limit is None:
+        return None
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        limit = -1
+    if limit < 0:
+        raise serializers.ValidationError(
+            {'recipes_limit': 'Должен быть целым числом.'})
+    return limit
+
+
+def sniff_image_type(head):
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"GIF8"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+class DecodedImageFile(TemporaryUploadedFile):
+    """Временный файл, который удаляется вместе с объектом."""
+
+    def __del__(self):
+        self.close()
+
+
 class Base64ImageField(serializers.ImageField):
+    """
+    Принимает изображение строкой data:image/...;base64 или файлом
+    из multipart-запроса. Base64 декодируется частями во временный файл;
+    слишком большие и неподходящие по типу изображения отклоняются
+    до полного декодирования.
+    """
+    default_error_messages = {
+        "too_large": "Размер изображения не должен превышать {max_size} Б.",
+        "invalid_type": "Допустимые форматы изображений: {types}.",
+        "invalid_base64": "Некорректная строка base64.",
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith("data:"):
-            header, base64_str = data.split(";base64,")
-            decoded_file = base64.b64decode(base64_str)
-            ext = header.split("/")[-1]
-            file_name = f"avatar_{self.context['request'].user.id}.{ext}"
-            data = ContentFile(decoded_file, name=file_name)
+            data = self.decode_data_uri(data)
+        elif isinstance(data, UploadedFile):
+            self.check_size(data.size)
+            data.seek(0)
+            self.check_type(sniff_image_type(data.read(IMAGE_SNIFF_BYTES)))
+            data.seek(0)
         return super().to_internal_value(data)
 
+    def check_size(self, size):
+        if size > settings.MAX_IMAGE_UPLOAD_SIZE:
+            self.fail("too_large", max_size=settings.MAX_IMAGE_UPLOAD_SIZE)
+
+    def check_type(self, image_type, declared=None):
+        declared = "jpeg" if declared == "jpg" else declared
+        if image_type not in IMAGE_TYPES or (
+                declared is not None and declared != image_type):
+            self.fail("invalid_type", types=", ".join(IMAGE_TYPES))
+
+    def decode_data_uri(self, data):
+        start = data.find(";base64,")
+        if start == -1:
+            self.fail("invalid_base64")
+        ext = data[len("data:"):start].split("/")[-1]
+        self.check_type(ext if ext != "jpg" else "jpeg")
+        start += len(";base64,")
+        self.check_size((len(data) - start) * 3 // 4)
+
+        file = DecodedImageFile(f"image.{ext}", f"image/{ext}", 0, None)
+        size = 0
+        try:
+            for offset in range(start, len(data), BASE64_CHUNK):
+                chunk = base64.b64decode(
+                    data[offset:offset + BASE64_CHUNK], validate=True)
+                if not size:
+                    self.check_type(sniff_image_type(chunk), declared=ext)
+                file.write(chunk)
+                size += len(chunk)
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail("invalid_base64")
+        except serializers.ValidationError:
+            file.close()
+            raise
+        file.size = size
+        file.seek(0)
+        return file
+
 
 class UserCreateSerializer(DjoserUserSerializer):
     first_name = serializers.CharField(required=True, max_length=150)
@@ -53,6 +141,8 @@ class UserResponseSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         request = self.context.get("request")
         return bool(
             request
@@ -103,7 +193,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     avatar = serializers.SerializerMethodField()
     is_subscribed = serializers.BooleanField(default=True)
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(source='author.recipes.count',
+    recipes_count = serializers.IntegerField(source='author.recipes_count',
                                              read_only=True)
 
     class Meta:
@@ -124,15 +214,11 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     def get_recipes(self, obj):
         from api.serializers.recipes import RecipeMinifiedSerializer
 
-        request = self.context.get('request')
-        limit = request.query_params.get('recipes_limit')
-        recipes_qs = obj.author.recipes.order_by('-created')
-        if limit is not None:
-            try:
-                limit = int(limit)
-            except (TypeError, ValueError):
-                raise serializers.ValidationError(
-                    {'recipes_limit': 'Должен быть целым числом.'})
-            recipes_qs = recipes_qs[:limit]
+        recipes = getattr(obj.author, 'preview_recipes', None)
+        if recipes is None:
+            limit = get_recipes_limit(self.context.get('request'))
+            recipes = obj.author.recipes.order_by('-created')
+            if limit is not None:
+                recipes = recipes[:limit]
         return RecipeMinifiedSerializer(
-            recipes_qs, many=True, context=self.context).data
+            recipes, many=True, context=self.context).data
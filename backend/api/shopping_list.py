@@ -0,0 +1,79 @@
+import csv
+from html import escape
+
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.cache import cart_version_name, get_version
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def render_txt(items):
+    for item in items:
+        yield (f"{item['name']} ({item['measurement_unit']}) — "
+               f"{item['total']}\n")
+
+
+def render_csv(items):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(("Ингредиент", "Единица измерения", "Количество"))
+    for item in items:
+        yield writer.writerow(
+            (item["name"], item["measurement_unit"], item["total"]))
+
+
+def render_html(items):
+    yield (
+        '<!DOCTYPE html><html lang="ru"><head><meta charset="utf-8">'
+        "<title>Список покупок</title><style>"
+        "body{font-family:sans-serif}td,th{padding:4px 12px;"
+        "border-bottom:1px solid #ccc;text-align:left}"
+        "</style></head><body><h1>Список покупок</h1><table>"
+        "<tr><th></th><th>Ингредиент</th><th>Количество</th></tr>"
+    )
+    for item in items:
+        yield (
+            f"<tr><td>&#9744;</td><td>{escape(item['name'])}</td>"
+            f"<td>{item['total']} {escape(item['measurement_unit'])}</td>"
+            "</tr>"
+        )
+    yield "</table></body></html>"
+
+
+FORMATS = {
+    "txt": (render_txt, "text/plain; charset=utf-8"),
+    "csv": (render_csv, "text/csv; charset=utf-8"),
+    "html": (render_html, "text/html; charset=utf-8"),
+}
+
+
+def cache_key(user, file_format):
+    return "shopping_list:{}:{}:{}:{}".format(
+        user.id, file_format,
+        get_version(cart_version_name(user.id)), get_version("ingredients"),
+    )
+
+
+def stream_and_cache(chunks, key):
+    """
+    Отдаёт куски по мере генерации и кладёт результат в кеш,
+    если он не превысил SHOPPING_LIST_CACHE_MAX_BYTES.
+    """
+    limit = getattr(settings, "SHOPPING_LIST_CACHE_MAX_BYTES", 1024 * 1024)
+    parts = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode()
+        if parts is not None:
+            size += len(data)
+            if size <= limit:
+                parts.append(data)
+            else:
+                parts = None
+        yield data
+    if parts is not None:
+        cache.set(key, b"".join(parts))
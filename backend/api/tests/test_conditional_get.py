@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email="author@example.com", username="author",
+            first_name="Автор", last_name="Рецептов", password="pass-12345")
+        cls.recipe = Recipe.objects.create(
+            author=author, name="Рецепт", text="Описание",
+            cooking_time=10, image="recipes/image.png")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_not_modified(self):
+        url = f"/api/recipes/{self.recipe.pk}/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_or_malformed_id_is_not_found(self):
+        for pk in (self.recipe.pk + 1, "abc"):
+            with self.subTest(pk=pk):
+                response = self.client.get(f"/api/recipes/{pk}/")
+                self.assertEqual(response.status_code, 404)
+
+    def test_list_not_modified_without_queries(self):
+        url = "/api/recipes/?limit=6"
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_validator_follows_changes(self):
+        url = "/api/recipes/"
+        etag = self.client.get(url)["ETag"]
+        self.assertNotEqual(
+            self.client.get(url + "?limit=6")["ETag"], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = "Другой рецепт"
+            self.recipe.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["name"],
+                         "Другой рецепт")
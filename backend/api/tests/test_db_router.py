@@ -0,0 +1,64 @@
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import router
+from django.test import SimpleTestCase
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from api import reference
+from api.mixins import AnonymousCacheMixin
+from config.db_router import primary, reset_replica, use_replica
+from recipes.models import Recipe, Tag
+
+REPLICA = "replica"
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    """
+    SimpleTestCase: внутри транзакции TestCase роутер и так
+    отправляет всё на основную базу.
+    """
+
+    def setUp(self):
+        cache.clear()
+        token = use_replica(REPLICA)
+        self.addCleanup(reset_replica, token)
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        self.assertEqual(router.db_for_read(Recipe), REPLICA)
+        self.assertEqual(router.db_for_write(Recipe), "default")
+
+    def test_primary_scope(self):
+        with primary():
+            self.assertEqual(router.db_for_read(Recipe), "default")
+        self.assertEqual(router.db_for_read(Recipe), REPLICA)
+
+    def test_anonymous_cache_is_filled_from_primary(self):
+        aliases = []
+
+        def handler(request):
+            aliases.append(router.db_for_read(Tag))
+            return Response([])
+
+        view = AnonymousCacheMixin()
+        view.cache_family = "tags"
+        request = Request(APIRequestFactory().get("/api/tags/"))
+        request.user = AnonymousUser()
+        view.cached(handler, request)
+        view.cached(handler, request)
+        self.assertEqual(aliases, ["default"])
+
+    def test_reference_bundle_is_built_from_primary(self):
+        aliases = []
+
+        def build_bundle(versions):
+            aliases.append(router.db_for_read(Tag))
+            return reference.ReferenceBundle(versions, b"{}")
+
+        with mock.patch.object(reference, "_bundle", None), \
+                mock.patch.object(reference, "build_bundle", build_bundle):
+            reference.get_bundle()
+        self.assertEqual(aliases, ["default"])
@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.indexes.ingredients import IngredientIndex
+from recipes.models import Ingredient
+
+
+class IngredientIndexTests(TestCase):
+    """
+    Автодополнение ингредиентов: сначала совпадения по префиксу,
+    затем по подстроке; изменения видны по версии в кеше.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ("Сахар", "Сахарная пудра", "Ванильный сахар", "Соль",
+                     "сахарин"):
+            Ingredient.objects.create(name=name, measurement_unit="г")
+
+    def setUp(self):
+        cache.clear()
+        self.index = IngredientIndex()
+
+    def names(self, prefix, **kwargs):
+        return [row["name"] for row in self.index.search(prefix, **kwargs)]
+
+    def test_prefix(self):
+        self.assertEqual(self.names("САХ"),
+                         ["Сахар", "сахарин", "Сахарная пудра"])
+        self.assertEqual(self.names("сах", limit=2),
+                         ["Сахар", "сахарин"])
+        self.assertEqual(self.names("перец"), [])
+
+    def test_contains_after_prefix(self):
+        self.assertEqual(
+            self.names("сахар", contains=True),
+            ["Сахар", "сахарин", "Сахарная пудра", "Ванильный сахар"])
+        self.assertEqual(self.names("сахар", contains=True, limit=3),
+                         ["Сахар", "сахарин", "Сахарная пудра"])
+
+    def test_changes_reach_other_processes(self):
+        other = IngredientIndex()
+        self.assertEqual(self.names("соль"), ["Соль"])
+        self.assertEqual(len(other.search("")), 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name="Соль морская",
+                                      measurement_unit="г")
+        self.assertEqual(self.names("соль"), ["Соль", "Соль морская"])
+        self.assertEqual(len(other.search("")), 6)
+
+    def test_search_without_queries(self):
+        self.index.search("")
+        with self.assertNumQueries(0):
+            self.index.search("сах", contains=True)
+
+    def test_endpoint(self):
+        response = APIClient().get(
+            "/api/ingredients/", {"name": "сахар", "contains": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row["name"] for row in response.data],
+            ["Сахар", "сахарин", "Сахарная пудра", "Ванильный сахар"])
@@ -0,0 +1,90 @@
+import re
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.serializers.recipes import (RecipeListSerializer,
+                                     RecipeMinifiedSerializer)
+from recipes.indexes.matrix import recipe_matrix
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+User = get_user_model()
+
+DELAY = 0.02
+
+
+def timings(response):
+    return {
+        name: float(duration) for name, duration in re.findall(
+            r"(\w+);dur=([\d.]+)", response["Server-Timing"])
+    }
+
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=1)
+class SerializerMetricsTests(TestCase):
+    """
+    Время сериализации учитывается для стандартных и собственных
+    действий и не входит во время view.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email="author@example.com", username="author",
+            first_name="Автор", last_name="Рецептов", password="pass-12345")
+        ingredient = Ingredient.objects.create(
+            name="Мука", measurement_unit="г")
+        cls.recipes = []
+        for number in range(2):
+            recipe = Recipe.objects.create(
+                author=author, name=f"Рецепт {number}", text="Описание",
+                cooking_time=10, image="recipes/image.png")
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=100)
+            cls.recipes.append(recipe)
+        cls.token = Token.objects.create(user=author)
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(recipe_matrix, "_data", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token}")
+
+    def assert_serializer_timed(self, serializer_class, request):
+        original = serializer_class.to_representation
+
+        def slow(serializer, instance):
+            time.sleep(DELAY)
+            return original(serializer, instance)
+
+        with mock.patch.object(serializer_class, "to_representation", slow):
+            response = request()
+        self.assertLess(response.status_code, 300)
+        self.assertGreaterEqual(timings(response)["serializer"],
+                                DELAY * 1000)
+
+    def test_list(self):
+        self.assert_serializer_timed(
+            RecipeListSerializer,
+            lambda: self.client.get("/api/recipes/"))
+
+    def test_similar(self):
+        self.assert_serializer_timed(
+            RecipeMinifiedSerializer,
+            lambda: self.client.get(
+                f"/api/recipes/{self.recipes[0].pk}/similar/"))
+
+    def test_bulk_add(self):
+        self.assert_serializer_timed(
+            RecipeMinifiedSerializer,
+            lambda: self.client.post(
+                "/api/recipes/favorite/",
+                {"recipes": [recipe.pk for recipe in self.recipes]},
+                format="json"))
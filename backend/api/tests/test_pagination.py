@@ -0,0 +1,61 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+def encode(cursor):
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email="author@example.com", username="author",
+            first_name="Автор", last_name="Рецептов", password="pass-12345")
+        for number in range(5):
+            Recipe.objects.create(
+                author=author, name=f"Рецепт {number}", text="Описание",
+                cooking_time=10, image="recipes/image.png")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, cursor):
+        return self.client.get(
+            "/api/recipes/", {"cursor": cursor, "limit": 2})
+
+    def test_walks_all_pages(self):
+        response = self.get("")
+        names = [recipe["name"] for recipe in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            self.assertEqual(response.status_code, 200)
+            names += [recipe["name"] for recipe in response.data["results"]]
+        self.assertEqual(
+            names, [f"Рецепт {number}" for number in range(4, -1, -1)])
+
+    def test_invalid_cursor_is_not_found(self):
+        cursors = {
+            "not base64": "%%%",
+            "wrong length": encode({"p": [1], "r": 0}),
+            "string date": encode({"p": ["garbage", 1], "r": 0}),
+            "object value": encode({"p": [{"a": 1}, 1], "r": 0}),
+            "null value": encode({"p": [None, 1], "r": 0}),
+            "float as date": encode({"p": [0.25, 1], "r": 0}),
+            "other ordering": encode({
+                "p": [0.25, 1], "r": 0, "o": ["-search_rank", "-id"]}),
+        }
+        for name, cursor in cursors.items():
+            with self.subTest(name):
+                self.assertEqual(self.get(cursor).status_code, 404)
@@ -0,0 +1,183 @@
+import base64
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscription
+
+User = get_user_model()
+
+LIST_QUERIES_ANONYMOUS = 4
+LIST_QUERIES_AUTHENTICATED = 5
+DETAIL_QUERIES_ANONYMOUS = 4
+DETAIL_QUERIES_AUTHENTICATED = 5
+CREATE_QUERIES = 14
+UPDATE_QUERIES = 18
+
+
+def png_image():
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 3), "red").save(buffer, "PNG")
+    return ("data:image/png;base64,"
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class RecipeQueryCountTests(TestCase):
+    """
+    Число SQL-запросов списка и карточки рецепта не зависит от размера
+    страницы, числа ингредиентов, тегов и флагов пользователя.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="reader@example.com", username="reader",
+            first_name="Иван", last_name="Читатель", password="pass-12345")
+        authors = [
+            User.objects.create_user(
+                email=f"author{number}@example.com",
+                username=f"author{number}", first_name="Автор",
+                last_name=str(number), password="pass-12345")
+            for number in range(3)
+        ]
+        tags = [Tag.objects.create(name=f"Тег {number}", slug=f"tag-{number}")
+                for number in range(3)]
+        ingredients = [
+            Ingredient.objects.create(name=f"Ингредиент {number}",
+                                      measurement_unit="г")
+            for number in range(10)
+        ]
+        for number in range(40):
+            recipe = Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f"Рецепт {number}", text="Описание",
+                cooking_time=10, image="recipes/image.png")
+            recipe.tags.set(tags[:1 + number % len(tags)])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=number + 1)
+                for ingredient in ingredients[:1 + number % 5])
+            if number % 3 == 0:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscription.objects.create(user=cls.user, author=authors[0])
+        cls.recipe = Recipe.objects.first()
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token}")
+
+    def assert_queries(self, client, url, expected):
+        cache.clear()
+        with self.assertNumQueries(expected):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_anonymous(self):
+        for limit in (6, 30):
+            with self.subTest(limit=limit):
+                response = self.assert_queries(
+                    self.anonymous, f"/api/recipes/?limit={limit}",
+                    LIST_QUERIES_ANONYMOUS)
+                self.assertEqual(len(response.data["results"]), limit)
+
+    def test_list_authenticated(self):
+        for limit in (6, 30):
+            with self.subTest(limit=limit):
+                response = self.assert_queries(
+                    self.client, f"/api/recipes/?limit={limit}",
+                    LIST_QUERIES_AUTHENTICATED)
+                self.assertEqual(len(response.data["results"]), limit)
+
+    def test_detail_anonymous(self):
+        self.assert_queries(self.anonymous, f"/api/recipes/{self.recipe.pk}/",
+                            DETAIL_QUERIES_ANONYMOUS)
+
+    def test_detail_authenticated(self):
+        self.assert_queries(self.client, f"/api/recipes/{self.recipe.pk}/",
+                            DETAIL_QUERIES_AUTHENTICATED)
+
+
+class RecipeWriteQueryCountTests(TestCase):
+    """
+    Число SQL-запросов создания и изменения рецепта не зависит от числа
+    добавленных, изменённых и удалённых ингредиентов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email="author@example.com", username="author",
+            first_name="Автор", last_name="Рецептов", password="pass-12345")
+        cls.tags = [
+            Tag.objects.create(name=f"Тег {number}", slug=f"tag-{number}")
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f"Ингредиент {number}",
+                                      measurement_unit="г")
+            for number in range(10)
+        ]
+        cls.token = Token.objects.create(user=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        patcher = mock.patch("recipes.signals.schedule_derivatives")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token}")
+
+    def payload(self, ingredients, amount=100):
+        return {
+            "name": "Рецепт", "text": "Описание", "cooking_time": 10,
+            "tags": [tag.pk for tag in self.tags[:2]],
+            "ingredients": [
+                {"id": ingredient.pk, "amount": amount}
+                for ingredient in ingredients
+            ],
+        }
+
+    def create(self, ingredients):
+        data = {**self.payload(ingredients), "image": png_image()}
+        response = self.client.post("/api/recipes/", data, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.data["id"]
+
+    def test_create(self):
+        for count in (1, 10):
+            with self.subTest(ingredients=count), \
+                    self.assertNumQueries(CREATE_QUERIES):
+                self.create(self.ingredients[:count])
+
+    def test_update(self):
+        # Первые два ингредиента остаются с новым количеством,
+        # остальные удаляются, и добавляются два новых.
+        ingredients = self.ingredients[:2] + self.ingredients[8:]
+        for count in (3, 8):
+            recipe_id = self.create(self.ingredients[:count])
+            with self.subTest(removed=count - 2), \
+                    self.assertNumQueries(UPDATE_QUERIES):
+                response = self.client.patch(
+                    f"/api/recipes/{recipe_id}/",
+                    self.payload(ingredients, amount=200), format="json")
+            self.assertEqual(response.status_code, 200)
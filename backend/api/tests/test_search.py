@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from recipes.indexes.search import MemorySearchIndex
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class MemorySearchIndexTests(TestCase):
+    """
+    Индекс в памяти узнаёт об изменениях из журнала в кеше, поэтому
+    каждый экземпляр (процесс) видит правки, сделанные в другом.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email="author@example.com", username="author",
+            first_name="Автор", last_name="Рецептов", password="pass-12345")
+
+    def setUp(self):
+        cache.clear()
+        self.first = MemorySearchIndex()
+        self.second = MemorySearchIndex()
+
+    def create(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Recipe.objects.create(
+                author=self.author, name=name, text="Описание",
+                cooking_time=10, image="")
+
+    def found(self, index, query):
+        return [pk for pk, _ in index.search(query, 10)]
+
+    def test_changes_reach_other_processes(self):
+        recipe = self.create("Борщ")
+        self.assertEqual(self.first.search("пельмени", 10), [])
+        self.assertEqual(self.second.search("пельмени", 10), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.name = "Пельмени"
+            recipe.save()
+        self.assertEqual(self.first.search("борщ", 10), [])
+        self.assertEqual(self.found(self.second, "пельмени"), [recipe.pk])
+
+        other = self.create("Пельмени с вишней")
+        self.assertEqual(self.found(self.first, "пельмени"),
+                         [recipe.pk, other.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertEqual(self.found(self.first, "пельмени"), [other.pk])
+        self.assertEqual(self.found(self.second, "пельмени"), [other.pk])
+
+    def test_lost_log_rebuilds_index(self):
+        recipe = self.create("Борщ")
+        self.assertEqual(self.found(self.first, "борщ"), [recipe.pk])
+        cache.clear()
+        Recipe.objects.filter(pk=recipe.pk).update(name="Солянка")
+        self.assertEqual(self.found(self.first, "солянка"), [recipe.pk])
@@ -0,0 +1,78 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.indexes.matrix import recipe_matrix
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+User = get_user_model()
+
+
+class SimilarAndPantryTests(TestCase):
+    """Похожие рецепты и подбор по продуктам из матрицы в памяти."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email="author@example.com", username="author",
+            first_name="Автор", last_name="Рецептов", password="pass-12345")
+        cls.ingredients = [
+            Ingredient.objects.create(name=f"Ингредиент {number}",
+                                      measurement_unit="г")
+            for number in range(5)
+        ]
+        cls.recipes = {}
+        for name, count in (("a", 5), ("b", 4), ("c", 2)):
+            recipe = Recipe.objects.create(
+                author=author, name=name, text="Описание",
+                cooking_time=10, image="recipes/image.png")
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=1)
+                for ingredient in cls.ingredients[:count])
+            cls.recipes[name] = recipe
+
+    def setUp(self):
+        cache.clear()
+        # Матрица собирается заново из данных теста.
+        patcher = mock.patch.object(recipe_matrix, "_data", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def test_unique_ingredient_does_not_hide_similar_recipes(self):
+        response = self.client.get(
+            f"/api/recipes/{self.recipes['a'].pk}/similar/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([recipe["name"] for recipe in response.data],
+                         ["b", "c"])
+
+    def test_similar_limit(self):
+        response = self.client.get(
+            f"/api/recipes/{self.recipes['a'].pk}/similar/?limit=1")
+        self.assertEqual([recipe["name"] for recipe in response.data],
+                         ["b"])
+
+    def test_similar_not_found(self):
+        for pk in ("abc", "0"):
+            with self.subTest(pk=pk):
+                response = self.client.get(f"/api/recipes/{pk}/similar/")
+                self.assertEqual(response.status_code, 404)
+
+    def test_pantry_ranks_by_coverage(self):
+        response = self.client.get("/api/recipes/pantry/", {
+            "ingredients": [self.ingredients[0].pk, self.ingredients[1].pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(recipe["name"], recipe["missing"])
+             for recipe in response.data["results"]],
+            [("c", 0), ("b", 2), ("a", 3)])
+
+    def test_pantry_rejects_invalid_ids(self):
+        response = self.client.get(
+            "/api/recipes/pantry/", {"ingredients": "abc"})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem)
+
+User = get_user_model()
+
+
+class UserRecipeBookkeepingTests(TestCase):
+    """
+    Счётчики рецептов и список покупок следуют за избранным и корзиной
+    при изменении через API и при удалении рецептов и пользователей.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email="author@example.com", username="author",
+            first_name="Автор", last_name="Рецептов", password="pass-12345")
+        cls.user = User.objects.create_user(
+            email="reader@example.com", username="reader",
+            first_name="Иван", last_name="Читатель", password="pass-12345")
+        cls.ingredient = Ingredient.objects.create(
+            name="Мука", measurement_unit="г")
+        cls.recipes = []
+        for number in range(10):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f"Рецепт {number}", text="Описание",
+                cooking_time=10, image="recipes/image.png")
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=cls.ingredient, amount=100)
+            cls.recipes.append(recipe)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token}")
+
+    def send(self, method, url, recipes):
+        return getattr(self.client, method)(
+            url, {"recipes": [recipe.pk for recipe in recipes]},
+            format="json")
+
+    def total(self):
+        return ShoppingListItem.objects.filter(user=self.user).values_list(
+            "total", flat=True).first()
+
+    def test_bulk_add_and_remove(self):
+        url = "/api/recipes/shopping_cart/"
+        self.send("post", url, self.recipes)
+        self.assertEqual(self.total(), 1000)
+
+        queries = []
+        for part in (self.recipes[:1], self.recipes[1:]):
+            with CaptureQueriesContext(connection) as context:
+                response = self.send("delete", url, part)
+            self.assertEqual(response.status_code, 204)
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+        self.assertIsNone(self.total())
+        self.assertFalse(Recipe.objects.filter(in_carts_count__gt=0).exists())
+
+    def test_recipe_deletion_updates_shopping_list(self):
+        ShoppingCart.objects.add(self.user, [self.recipes[0].pk,
+                                             self.recipes[1].pk])
+        self.recipes[0].delete()
+        self.assertEqual(self.total(), 100)
+
+    def test_user_deletion_updates_counters(self):
+        Favorite.objects.add(self.user, [self.recipes[0].pk])
+        ShoppingCart.objects.add(self.user, [self.recipes[0].pk])
+        self.user.delete()
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        self.assertEqual(
+            (recipe.favorites_count, recipe.in_carts_count), (0, 0))
@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views.recipes import (IngredientViewSet, RecipeViewSet,
+from api.views.recipes import (CacheStatsView, IngredientViewSet,
+                               RecipeViewSet, ReferenceDataView,
                                ShortLinkView, TagViewSet)
 from api.views.users import UserViewSet
 
@@ -13,6 +14,10 @@ router.register(r'recipes', RecipeViewSet, basename='recipes')
 
 urlpatterns = [
     path('r/<int:recipe_id>/', ShortLinkView.as_view(), name='short_link'),
+    path('cache-stats/', CacheStatsView.as_view(), name='cache_stats'),
+    path('reference/', ReferenceDataView.as_view(), name='reference'),
+    path('reference/<str:digest>/', ReferenceDataView.as_view(),
+         name='reference_data'),
 
     path('', include(router.urls)),
 ]
@@ -1,18 +1,36 @@
-from django.shortcuts import get_object_or_404
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.http import (HttpResponse, HttpResponseRedirect,
+                         StreamingHttpResponse)
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from api import reference, shopping_list
+from api.constants import MAX_SIMILAR_RECIPES, SIZE_PAGE
 from api.filters import IngredientFilter, RecipeInlineFilter
-from api.pagination import DefaultPagination
+from api.mixins import (AnonymousCacheMixin, ConditionalGetMixin,
+                        SerializerMetricsMixin)
+from api.pagination import DefaultPagination, PagePagination
 from api.permissions import IsAuthorOrReadOnly
 from api.serializers.recipes import (IngredientSerializer,
+                                     PantryRecipeSerializer,
                                      RecipeCreateUpdateSerializer,
+                                     RecipeIdsSerializer,
                                      RecipeListSerializer,
                                      RecipeMinifiedSerializer, TagSerializer)
+from recipes.cache import (cart_version_name, favorites_version_name,
+                           get_counts, subscriptions_version_name)
+from recipes.indexes.ingredients import ingredient_index
+from recipes.indexes.pantry import match_pantry
+from recipes.indexes.similarity import similar_recipes
 from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
 
 
@@ -26,32 +44,104 @@ class ShortLinkView(APIView):
         return Response({"short-link": absolute}, status=status.HTTP_200_OK)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class ReferenceDataView(APIView):
+    """
+    Теги и ингредиенты одним ответом. Без digest перенаправляет на
+    адрес с хешем содержимого, который можно кешировать навсегда.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request, digest=None):
+        bundle = reference.get_bundle()
+        if digest != bundle.digest:
+            response = HttpResponseRedirect(
+                reverse("reference_data", kwargs={"digest": bundle.digest}))
+            response["Cache-Control"] = "no-cache"
+            return response
+        if "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", ""):
+            response = HttpResponse(
+                bundle.gzipped, content_type="application/json")
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(
+                bundle.raw, content_type="application/json")
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+
+class CacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+    families = ("recipes", "tags", "ingredients")
+
+    def get(self, request):
+        stats = {}
+        for family in self.families:
+            hits, misses = f"{family}:hits", f"{family}:misses"
+            counts = get_counts(hits, misses)
+            stats[family] = {"hits": counts[hits], "misses": counts[misses]}
+        return Response(stats)
+
+
+class TagViewSet(AnonymousCacheMixin, SerializerMetricsMixin,
+                 viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    cache_family = "tags"
     permission_classes = [AllowAny]
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(AnonymousCacheMixin, SerializerMetricsMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    cache_family = "ingredients"
     permission_classes = [AllowAny]
     filter_backends = [DjangoFilterBackend]
     filterset_class = IngredientFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        contains = request.query_params.get("contains") == "1"
+        return Response(ingredient_index.search(name, contains=contains))
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, AnonymousCacheMixin,
+                    SerializerMetricsMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
+    cache_family = "recipes"
     pagination_class = DefaultPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeInlineFilter
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ("list", "retrieve"):
+            queryset = queryset.with_related().with_user_flags(
+                self.request.user)
+        return queryset
+
+    def get_validator_versions(self, request):
+        user = request.user
+        if not user.is_authenticated:
+            return []
+        return [
+            favorites_version_name(user.id),
+            cart_version_name(user.id),
+            subscriptions_version_name(user.id),
+        ]
+
     def get_permissions(self):
-        if self.action in ["list", "retrieve", "get_link"]:
+        if self.action in ["list", "retrieve", "get_link", "similar",
+                           "pantry"]:
             return [AllowAny()]
-        if self.action in ["favorite", "shopping_cart", "create"]:
+        if self.action in ["favorite", "favorite_many", "shopping_cart",
+                           "shopping_cart_many", "create"]:
             return [IsAuthenticated()]
         return [IsAuthorOrReadOnly()]
 
@@ -66,54 +156,125 @@ class RecipeViewSet(viewsets.ModelViewSet):
         absolute_url = request.build_absolute_uri(recipe.get_short_link())
         return Response({"short-link": absolute_url})
 
-    @action(
-        detail=True, methods=["post", "delete"],
-        permission_classes=[IsAuthenticated]
-    )
-    def favorite(self, request, pk=None):
+    @action(detail=True, methods=["get"])
+    def similar(self, request, pk=None):
+        """Рецепты с похожим составом, самые похожие первыми."""
         recipe = get_object_or_404(Recipe, pk=pk)
+        try:
+            limit = int(request.query_params.get("limit", SIZE_PAGE))
+        except ValueError:
+            limit = SIZE_PAGE
+        limit = min(max(limit, 1), MAX_SIMILAR_RECIPES)
+        ids = similar_recipes(recipe.pk, limit)
+        recipes = Recipe.objects.in_bulk(ids)
+        serializer = RecipeMinifiedSerializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True,
+            context={"request": request},
+        )
+        return Response(self.serialize(serializer))
+
+    @action(detail=False, methods=["get"])
+    def pantry(self, request):
+        """
+        Что можно приготовить из ?ingredients=1&ingredients=2...:
+        рецепты по убыванию доли имеющихся ингредиентов.
+        """
+        try:
+            ingredient_ids = [
+                int(pk) for pk in request.query_params.getlist("ingredients")]
+        except ValueError:
+            return Response(
+                {"ingredients": "Ожидаются id ингредиентов."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        paginator = PagePagination()
+        page = paginator.paginate_queryset(
+            match_pantry(ingredient_ids), request, view=self)
+        recipes = (
+            Recipe.objects.with_related().with_user_flags(request.user)
+            .in_bulk([pk for pk, _, _ in page])
+        )
+        results = []
+        for pk, matched, total in page:
+            recipe = recipes.get(pk)
+            if recipe is not None:
+                recipe.coverage = round(matched / total, 3)
+                recipe.missing = total - matched
+                results.append(recipe)
+        serializer = PantryRecipeSerializer(
+            results, many=True, context={"request": request})
+        return paginator.get_paginated_response(self.serialize(serializer))
 
+    def add_or_remove(self, request, model, pk):
+        """
+        Добавляет рецепт в избранное или корзину и удаляет из них.
+        Повторное добавление и удаление отсутствующего дают 400.
+        """
+        recipe = get_object_or_404(Recipe, pk=pk)
         if request.method == "POST":
-            if Favorite.objects.filter(
-                user=request.user, recipe=recipe
-            ).exists():
+            if not model.objects.add(request.user, [recipe.pk]):
                 return Response(status=status.HTTP_400_BAD_REQUEST)
-            fav = Favorite(user=request.user, recipe=recipe)
-            fav.save()
             serializer = RecipeMinifiedSerializer(
                 recipe, context={"request": request})
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(self.serialize(serializer),
+                            status=status.HTTP_201_CREATED)
 
-        deleted_count, _ = Favorite.objects.filter(
-            user=request.user, recipe=recipe).delete()
-        if not deleted_count:
+        if not model.objects.remove(request.user, [recipe.pk]):
             return Response(status=status.HTTP_400_BAD_REQUEST)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def add_or_remove_many(self, request, model):
+        """
+        То же для списка {"recipes": [id, ...]} одним запросом.
+        POST возвращает добавленные рецепты, уже добавленные пропускаются.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipes = {
+            recipe.pk: recipe
+            for recipe in serializer.validated_data["recipes"]
+        }
+        if request.method == "POST":
+            added = model.objects.add(request.user, list(recipes))
+            data = self.serialize(RecipeMinifiedSerializer(
+                [recipes[pk] for pk in added], many=True,
+                context={"request": request},
+            ))
+            return Response(data, status=status.HTTP_201_CREATED)
+
+        model.objects.remove(request.user, list(recipes))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        detail=True, methods=["post", "delete"],
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite(self, request, pk=None):
+        return self.add_or_remove(request, Favorite, pk)
+
+    @action(
+        detail=False, methods=["post", "delete"],
+        url_path="favorite",
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite_many(self, request):
+        return self.add_or_remove_many(request, Favorite)
+
     @action(
         detail=True, methods=["post", "delete"],
         url_path="shopping_cart",
         permission_classes=[IsAuthenticated]
     )
     def shopping_cart(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
+        return self.add_or_remove(request, ShoppingCart, pk)
 
-        if request.method == "POST":
-            if ShoppingCart.objects.filter(
-                user=request.user, recipe=recipe
-            ).exists():
-                return Response(status=status.HTTP_400_BAD_REQUEST)
-            cart_item = ShoppingCart(user=request.user, recipe=recipe)
-            cart_item.save()
-            data = RecipeMinifiedSerializer(
-                recipe, context={"request": request}).data
-            return Response(data, status=status.HTTP_201_CREATED)
-
-        deleted_count, _ = ShoppingCart.objects.filter(
-            user=request.user, recipe=recipe).delete()
-        if not deleted_count:
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-        return Response(status=status.HTTP_204_NO_CONTENT)
+    @action(
+        detail=False, methods=["post", "delete"],
+        url_path="shopping_cart",
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_many(self, request):
+        return self.add_or_remove_many(request, ShoppingCart)
 
     @action(
         detail=False,
@@ -122,8 +283,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_path="download_shopping_cart"
     )
     def download_shopping_cart(self, request):
-        lines = (
-            f"{it['name']} ({it['measurement_unit']}) — {it['total']}"
-            for it in request.user.get_shopping_list()
-        )
-        return Response("\n".join(lines), content_type="text/plain")
+        file_format = request.query_params.get("type", "txt")
+        if file_format not in shopping_list.FORMATS:
+            return Response(
+                {"type": "Доступные форматы: "
+                         + ", ".join(shopping_list.FORMATS)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        render, content_type = shopping_list.FORMATS[file_format]
+        key = shopping_list.cache_key(request.user, file_format)
+        content = cache.get(key)
+        if content is not None:
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            # Список попадёт в общий кеш, поэтому читается с основной
+            # базы, а не с реплики.
+            items = request.user.get_shopping_list().using(
+                DEFAULT_DB_ALIAS).iterator()
+            response = StreamingHttpResponse(
+                shopping_list.stream_and_cache(render(items), key),
+                content_type=content_type,
+            )
+        response["Content-Disposition"] = (
+            f'attachment; filename="shopping_list.{file_format}"')
+        return response
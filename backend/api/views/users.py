@@ -1,10 +1,13 @@
 from django.contrib.auth import get_user_model
+from django.db.models import (Exists, OuterRef, Prefetch, Subquery,
+                              prefetch_related_objects)
 from django.shortcuts import get_object_or_404
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from api.mixins import SerializerMetricsMixin
 from api.pagination import DefaultPagination
 from api.serializers.users import (
     UserCreateSerializer,
@@ -13,13 +16,16 @@ from api.serializers.users import (
     SubscriptionCreateSerializer,
     PasswordChangeSerializer,
     SetAvatarSerializer,
+    get_recipes_limit,
 )
+from recipes.models import Recipe
 from users.models import Subscription
 
 User = get_user_model()
 
 
 class UserViewSet(
+    SerializerMetricsMixin,
     mixins.CreateModelMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
@@ -28,6 +34,15 @@ class UserViewSet(
     queryset = User.objects.all()
     pagination_class = DefaultPagination
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if self.action in ("list", "retrieve") and user.is_authenticated:
+            queryset = queryset.annotate(is_subscribed=Exists(
+                Subscription.objects.filter(user=user, author=OuterRef("pk"))
+            ))
+        return queryset
+
     def get_permissions(self):
         if self.action in ("create", "list", "retrieve"):
             return [AllowAny()]
@@ -47,12 +62,23 @@ class UserViewSet(
         permission_classes=[IsAuthenticated]
     )
     def subscriptions(self, request):
+        limit = get_recipes_limit(request)
         qs = Subscription.objects.filter(
-            user=request.user).select_related('author')
+            user=request.user).select_related('author').order_by('id')
         page = self.paginate_queryset(qs)
+        recipes = Recipe.objects.order_by('-created')
+        if limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects
+                .filter(author_id=OuterRef('author_id'))
+                .order_by('-created')
+                .values('pk')[:limit]
+            ))
+        prefetch_related_objects(page, Prefetch(
+            'author__recipes', queryset=recipes, to_attr='preview_recipes'))
         serializer = self.get_serializer(page, many=True,
                                          context={"request": request})
-        return self.get_paginated_response(serializer.data)
+        return self.get_paginated_response(self.serialize(serializer))
 
     @action(
         detail=True, methods=["post", "delete"], url_path="subscribe",
@@ -71,7 +97,8 @@ class UserViewSet(
                                 status=status.HTTP_400_BAD_REQUEST)
             serializer = SubscriptionSerializer(sub,
                                                 context={"request": request})
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(self.serialize(serializer),
+                            status=status.HTTP_201_CREATED)
 
         deleted, _ = Subscription.objects.filter(
             user=request.user, author=author).delete()
@@ -94,7 +121,7 @@ class UserViewSet(
         serializer = UserResponseSerializer(
             request.user, context={"request": request}
         )
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(self.serialize(serializer), status=status.HTTP_200_OK)
 
     @action(
         detail=False,
@@ -117,7 +144,8 @@ class UserViewSet(
             )
 
         if user.avatar:
-            user.avatar.delete(save=False)
+            # Файл может использоваться другими записями с тем же
+            # содержимым; неиспользуемые файлы удаляет sweep_media.
             user.avatar = None
             user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
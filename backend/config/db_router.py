@@ -0,0 +1,81 @@
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_replica = ContextVar("replica_alias", default=None)
+
+
+def replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", ()))
+
+
+def use_replica(alias):
+    """Направляет чтение текущего запроса на реплику; None — на основную."""
+    return _replica.set(alias)
+
+
+def reset_replica(token):
+    _replica.reset(token)
+
+
+@contextmanager
+def primary():
+    """
+    Внутри блока чтение идёт на основную базу, даже если запрос
+    направлен на реплику. Так читают данные, которые кладутся в общий
+    кеш под текущей версией: отстающая реплика может вернуть строки
+    до изменения, сменившего версию, и они остались бы в кеше до
+    следующего изменения.
+    """
+    token = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+def _sticky_key(identity):
+    digest = hashlib.sha256(identity.encode()).hexdigest()
+    return f"replica:primary:{digest}"
+
+
+def stick_to_primary(identity):
+    """
+    На REPLICA_STICKY_SECONDS закрепляет клиента с этими учётными
+    данными за основной базой, чтобы он сразу видел свои изменения.
+    """
+    timeout = getattr(settings, "REPLICA_STICKY_SECONDS", 0)
+    if identity and timeout and replicas():
+        cache.set(_sticky_key(identity), True, timeout)
+
+
+def is_sticky(identity):
+    return bool(identity) and cache.get(_sticky_key(identity), False)
+
+
+class ReplicaRouter:
+    """
+    Чтение идёт на реплику, выбранную для запроса
+    ReplicaRoutingMiddleware. Запись, чтение внутри транзакции и всё,
+    что выполняется вне HTTP-запросов (команды, фоновые потоки), —
+    на основную базу. Реплики — копии основной базы, их не мигрируют.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
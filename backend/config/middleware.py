@@ -0,0 +1,160 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from config.db_router import (is_sticky, replicas, reset_replica,
+                              stick_to_primary, use_replica)
+
+logger = logging.getLogger("config.request_metrics")
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_name = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def as_dict(self):
+        now = time.perf_counter()
+        view_time = now - self.view_started if self.view_started else 0.0
+        # Сериализация идёт внутри view, но учитывается отдельно.
+        view_time = max(view_time - self.serializer_time, 0.0)
+        return {
+            "view": self.view_name,
+            "queries": self.queries,
+            "db_ms": round(self.db_time * 1000, 2),
+            "serializer_ms": round(self.serializer_time * 1000, 2),
+            "view_ms": round(view_time * 1000, 2),
+            "total_ms": round((now - self.started) * 1000, 2),
+        }
+
+
+@contextmanager
+def measure_serializer():
+    """
+    Учитывает время блока как время сериализации в метриках текущего
+    запроса. Если запрос не замеряется, ничего не делает.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - start
+
+
+def _view_name(request, view_func):
+    cls = getattr(view_func, "cls", None)
+    if cls is None:
+        return getattr(view_func, "__name__", None)
+    actions = getattr(view_func, "actions", None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f"{cls.__name__}.{action}"
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет число SQL-запросов и время БД, сериализации и view.
+    Результат отдаётся в заголовке Server-Timing и, при
+    REQUEST_METRICS_LOG, пишется в лог одной JSON-строкой.
+    Включается ненулевым REQUEST_METRICS_SAMPLE_RATE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(
+            settings, "REQUEST_METRICS_SAMPLE_RATE", 0)
+        self.log = getattr(settings, "REQUEST_METRICS_LOG", False)
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        request.metrics = metrics
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        data = metrics.as_dict()
+        response["Server-Timing"] = ", ".join((
+            f'db;dur={data["db_ms"]};desc="{data["queries"]} queries"',
+            f'serializer;dur={data["serializer_ms"]}',
+            f'view;dur={data["view_ms"]}',
+            f'total;dur={data["total_ms"]}',
+        ))
+        if self.log:
+            data.update(method=request.method, path=request.path,
+                        status=response.status_code)
+            logger.info(json.dumps(data, ensure_ascii=False))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = getattr(request, "metrics", None)
+        if metrics is not None:
+            metrics.view_name = _view_name(request, view_func)
+            metrics.view_started = time.perf_counter()
+
+
+def _client_identity(request):
+    """Учётные данные клиента: токен или сессия администратора."""
+    return request.META.get("HTTP_AUTHORIZATION") or request.COOKIES.get(
+        settings.SESSION_COOKIE_NAME)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Безопасные запросы читают с одной из DATABASE_REPLICAS, остальные
+    целиком выполняются на основной базе. После успешной записи клиент
+    на REPLICA_STICKY_SECONDS закрепляется за основной базой.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.replicas = replicas()
+
+    def __call__(self, request):
+        if not self.replicas:
+            return self.get_response(request)
+
+        identity = _client_identity(request)
+        safe = request.method in SAFE_METHODS
+        alias = None
+        if safe and not is_sticky(identity):
+            alias = random.choice(self.replicas)
+        token = use_replica(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_replica(token)
+        if not safe and response.status_code < 400:
+            stick_to_primary(identity)
+        return response
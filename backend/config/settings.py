@@ -28,12 +28,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "config.middleware.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "config.middleware.RequestMetricsMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -67,6 +69,31 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: DB_REPLICA_HOSTS=replica1,replica2.
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+        filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")), 1):
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{number}")
+DATABASE_ROUTERS = ["config.db_router.ReplicaRouter"]
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "foodgram"),
+    }
+}
+
+API_CACHE_TIMEOUT = int(os.getenv("API_CACHE_TIMEOUT", 300))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -98,6 +125,18 @@ STATIC_ROOT = BASE_DIR / "collected_static"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = "/media/"
+DEFAULT_FILE_STORAGE = "config.storage.ContentAddressedStorage"
+
+MAX_IMAGE_UPLOAD_SIZE = int(
+    os.getenv("MAX_IMAGE_UPLOAD_SIZE", 10 * 1024 * 1024))
+FILE_UPLOAD_HANDLERS = [
+    "config.uploads.LimitedTemporaryFileUploadHandler",
+]
+# Обычные поля multipart-формы (ингредиенты, теги) держатся в памяти.
+DATA_UPLOAD_MAX_MEMORY_SIZE = int(
+    os.getenv("DATA_UPLOAD_MAX_MEMORY_SIZE", 2621440))
+
+IMAGE_DERIVATIVE_WORKERS = int(os.getenv("IMAGE_DERIVATIVE_WORKERS", 2))
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -114,3 +153,32 @@ REST_FRAMEWORK = {
 }
 
 AUTH_USER_MODEL = "users.User"
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv("INGREDIENT_SEARCH_LIMIT", 50))
+
+RECIPE_SEARCH_BACKEND = os.getenv("RECIPE_SEARCH_BACKEND", "")
+RECIPE_SEARCH_LIMIT = int(os.getenv("RECIPE_SEARCH_LIMIT", 1000))
+
+SIMILAR_RECIPES_TAG_BOOST = float(os.getenv("SIMILAR_RECIPES_TAG_BOOST", 0.2))
+SIMILAR_RECIPES_MAX_DF = float(os.getenv("SIMILAR_RECIPES_MAX_DF", 0.05))
+
+SHOPPING_LIST_CACHE_MAX_BYTES = int(
+    os.getenv("SHOPPING_LIST_CACHE_MAX_BYTES", 1024 * 1024))
+
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.getenv("REQUEST_METRICS_SAMPLE_RATE", 0))
+REQUEST_METRICS_LOG = os.getenv("REQUEST_METRICS_LOG", False) == "True"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "config.request_metrics": {
+            "handlers": ["console"],
+            "level": "INFO",
+        },
+    },
+}
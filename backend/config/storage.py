@@ -0,0 +1,56 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_NAME = re.compile(r"(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}(\.[^/]*)?$")
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранит файлы под именем из SHA-256 содержимого:
+    <каталог upload_to>/<2 символа хеша>/<хеш><расширение>.
+    Одинаковые файлы сохраняются один раз, а адрес файла никогда
+    не меняется, поэтому его можно кешировать как immutable.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # FileSystemStorage._save спрашивает новое имя, когда файл
+        # с тем же хешем успел записать параллельный запрос: такой файл
+        # уже готов, и _save просто возвращает его имя.
+        if CONTENT_NAME.search(name) and self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+    def _touch(self, name):
+        """
+        Обновляет время изменения повторно загруженного файла, чтобы
+        sweep_media --min-age не удалил его раньше, чем сохранится
+        ссылка на него. Возвращает False, если файла уже нет.
+        """
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, "seek"):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, "seek"):
+            content.seek(0)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        digest = digest.hexdigest()
+        name = os.path.join(directory, digest[:2], digest + extension)
+        if self.exists(name) and self._touch(name):
+            return name
+        try:
+            return super()._save(name, content)
+        except FileExistsError:
+            self._touch(name)
+            return name
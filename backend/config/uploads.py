@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет файлы multipart-запроса во временный файл, но не более
+    MAX_IMAGE_UPLOAD_SIZE байт. Остаток слишком большого файла
+    не сохраняется, а в size остаётся полный размер, и поле отклоняет
+    файл сообщением о размере. Тело длиннее предела вместе с обычными
+    полями формы отклоняется сразу, без чтения.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        limit = settings.MAX_IMAGE_UPLOAD_SIZE
+        extra = settings.DATA_UPLOAD_MAX_MEMORY_SIZE or 0
+        if content_length and content_length > limit + extra:
+            raise RequestDataTooBig(
+                "Тело запроса больше MAX_IMAGE_UPLOAD_SIZE.")
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.too_large:
+            return None
+        if start + len(raw_data) > settings.MAX_IMAGE_UPLOAD_SIZE:
+            self.too_large = True
+            return None
+        return super().receive_data_chunk(raw_data, start)
@@ -1,4 +1,7 @@
+from collections import defaultdict
+
 from django.contrib import admin
+from django.contrib.auth import get_user_model
 
 from recipes.models import (
     RecipeIngredient,
@@ -6,9 +9,12 @@ from recipes.models import (
     Ingredient,
     Tag,
     ShoppingCart,
+    ShoppingListItem,
     Recipe
 )
 
+User = get_user_model()
+
 
 class IngredientInline(admin.TabularInline):
     model = RecipeIngredient
@@ -37,24 +43,58 @@ class TagAdmin(admin.ModelAdmin):
 class RecipeAdmin(admin.ModelAdmin):
     inlines = [IngredientInline]
     list_display = ("name", "author", "favorites_count", "created", "id")
+    list_select_related = ("author",)
     search_fields = ("name", "author__username", "author__email")
     list_filter = ("author", "tags")
-    readonly_fields = ("favorites_count",)
+    readonly_fields = ("favorites_count", "in_carts_count")
 
-    @admin.display(description="В избранном")
-    def favorites_count(self, obj):
-        return obj.in_favorites.count()
+    def save_related(self, request, form, formsets, change):
+        old_amounts = dict(form.instance.recipe_ingredients.values_list(
+            "ingredient_id", "amount")) if change else {}
+        super().save_related(request, form, formsets, change)
+        if change:
+            ShoppingListItem.objects.update_recipe(
+                form.instance.id, old_amounts,
+                dict(form.instance.recipe_ingredients.values_list(
+                    "ingredient_id", "amount")),
+            )
 
 
-@admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class UserRecipeAdmin(admin.ModelAdmin):
+    """
+    Строки добавляются и удаляются через add()/remove() менеджера,
+    которые обновляют счётчики, список покупок и версии кеша.
+    """
     list_display = ("user", "recipe")
     search_fields = ("user__username", "recipe__name")
     list_filter = ("user",)
 
+    def get_readonly_fields(self, request, obj=None):
+        return ("user", "recipe") if obj else ()
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            return
+        self.model.objects.add(obj.user, [obj.recipe_id])
+        obj.pk = self.model.objects.get(
+            user=obj.user, recipe_id=obj.recipe_id).pk
+
+    def delete_model(self, request, obj):
+        self.model.objects.remove(obj.user, [obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = defaultdict(list)
+        for user_id, recipe_id in queryset.values_list("user_id", "recipe_id"):
+            recipe_ids[user_id].append(recipe_id)
+        for user in User.objects.filter(pk__in=recipe_ids):
+            self.model.objects.remove(user, recipe_ids[user.pk])
+
+
+@admin.register(Favorite)
+class FavoriteAdmin(UserRecipeAdmin):
+    pass
+
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
-    list_display = ("user", "recipe")
-    search_fields = ("user__username", "recipe__name")
-    list_filter = ("user",)
+class ShoppingCartAdmin(UserRecipeAdmin):
+    pass
@@ -0,0 +1,96 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(name):
+    return f"version:{name}"
+
+
+def get_version(name):
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_versions(*names):
+    if names:
+        version = time.time_ns()
+        cache.set_many({_version_key(name): version for name in names}, None)
+
+
+def bump_versions_on_commit(*names):
+    transaction.on_commit(lambda: bump_versions(*names))
+
+
+def count(name):
+    key = f"counter:{name}"
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def get_counts(*names):
+    values = cache.get_many([f"counter:{name}" for name in names])
+    return {name: values.get(f"counter:{name}", 0) for name in names}
+
+
+def cart_version_name(user_id):
+    return f"cart:{user_id}"
+
+
+def favorites_version_name(user_id):
+    return f"favorites:{user_id}"
+
+
+def subscriptions_version_name(user_id):
+    return f"subscriptions:{user_id}"
+
+
+# Журнал изменений: номер последней записи в changes:<name>, id
+# изменённых объектов — в changes:<name>:<номер>. По нему индексы
+# в памяти других процессов обновляются точечно, без полной сборки.
+CHANGES_TIMEOUT = 24 * 60 * 60
+MAX_CHANGES = 1000
+
+
+def _changes_key(name, number=None):
+    if number is None:
+        return f"changes:{name}"
+    return f"changes:{name}:{number}"
+
+
+def log_changes(name, ids):
+    key = _changes_key(name)
+    cache.add(key, 0, None)
+    try:
+        number = cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+        number = 1
+    cache.set(_changes_key(name, number), list(ids), CHANGES_TIMEOUT)
+
+
+def get_changes_number(name):
+    return cache.get(_changes_key(name), 0)
+
+
+def get_changes(name, start, end):
+    """
+    id, изменённые записями журнала с номерами start + 1 … end, или None,
+    если записей слишком много или часть уже вытеснена из кеша — тогда
+    индекс нужно собрать заново.
+    """
+    if end < start or end - start > MAX_CHANGES:
+        return None
+    keys = [_changes_key(name, number) for number in range(start + 1, end + 1)]
+    values = cache.get_many(keys)
+    if len(values) != len(keys):
+        return None
+    return set().union(*values.values())
@@ -0,0 +1,107 @@
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from api.constants import IMAGE_FORMATS, IMAGE_SIZES
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def derivative_name(name, size, image_format):
+    path = PurePosixPath(name)
+    return str(PurePosixPath("derivatives", path.parent, path.stem,
+                             f"{size}.{image_format}"))
+
+
+def generate_derivatives(source, target_root, name):
+    """
+    Создаёт уменьшенные копии изображения во всех размерах и форматах.
+    Работает без Django, чтобы выполняться в отдельном процессе.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = "A" in original.getbands()
+        for size, side in IMAGE_SIZES.items():
+            image = original.copy()
+            image.thumbnail((side, side))
+            for image_format in IMAGE_FORMATS:
+                target = os.path.join(
+                    target_root, derivative_name(name, size, image_format))
+                if os.path.exists(target):
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if image_format == "webp":
+                    converted = image.convert("RGBA" if has_alpha else "RGB")
+                    options = {"format": "WEBP", "quality": 80}
+                else:
+                    converted = image.convert("RGB")
+                    options = {"format": "JPEG", "quality": 85,
+                               "optimize": True, "progressive": True}
+                temporary = f"{target}.tmp"
+                converted.save(temporary, **options)
+                os.replace(temporary, target)
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error("Не удалось создать копии изображения",
+                     exc_info=future.exception())
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_DERIVATIVE_WORKERS)
+        return _executor
+
+
+def schedule_derivatives(name):
+    """Ставит генерацию копий в очередь после фиксации транзакции."""
+    if not name:
+        return
+    args = (default_storage.path(name), str(settings.MEDIA_ROOT), name)
+
+    def submit():
+        if not settings.IMAGE_DERIVATIVE_WORKERS:
+            generate_derivatives(*args)
+            return
+        _get_executor().submit(
+            generate_derivatives, *args).add_done_callback(_log_failure)
+
+    transaction.on_commit(submit)
+
+
+def derivative_urls(field_file):
+    """
+    Ссылки на копии изображения по размерам и форматам. Пока копии
+    не готовы, все ссылки указывают на оригинал.
+    """
+    if not field_file:
+        return None
+    name = field_file.name
+    last_size = list(IMAGE_SIZES)[-1]
+    ready = default_storage.exists(
+        derivative_name(name, last_size, IMAGE_FORMATS[-1]))
+    return {
+        size: {
+            image_format: (
+                default_storage.url(derivative_name(name, size, image_format))
+                if ready else field_file.url
+            )
+            for image_format in IMAGE_FORMATS
+        }
+        for size in IMAGE_SIZES
+    }
@@ -0,0 +1,74 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from recipes.cache import get_version
+from recipes.models import Ingredient
+
+MAX_CHAR = chr(0x10FFFF)
+VERSION = "ingredients"
+
+
+class IngredientIndex:
+    """
+    Отсортированный по casefold-имени список ингредиентов в памяти
+    процесса. Поиск по префиксу — бинарный поиск, без обращения к БД.
+    Индекс собирается заново, когда меняется версия ingredients
+    (recipes.cache): её поднимают после коммита сигналы Ingredient
+    и команда load_ingredients, поэтому изменения из любого процесса
+    видны всем остальным при следующем запросе.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+
+    @staticmethod
+    def build(version):
+        # С основной базы: после смены версии реплика может ещё
+        # не содержать изменений, и индекс застыл бы до следующей.
+        entries = sorted(
+            (name.casefold(), pk, name, unit)
+            for pk, name, unit in Ingredient.objects.using(
+                DEFAULT_DB_ALIAS).values_list(
+                    "id", "name", "measurement_unit")
+        )
+        rows = tuple(
+            {"id": pk, "name": name, "measurement_unit": unit}
+            for _, pk, name, unit in entries
+        )
+        return version, [key for key, *_ in entries], rows
+
+    def _ensure_built(self):
+        # Версия читается до данных: изменение, закоммиченное во время
+        # сборки, снова сменит версию и вызовет ещё одну сборку.
+        version = get_version(VERSION)
+        data = self._data
+        if data is not None and data[0] == version:
+            return data
+        with self._lock:
+            if self._data is None or self._data[0] != version:
+                self._data = self.build(version)
+            return self._data
+
+    def search(self, prefix, limit=None, contains=False):
+        _, keys, rows = self._ensure_built()
+        if limit is None:
+            limit = getattr(settings, "INGREDIENT_SEARCH_LIMIT", 50)
+        prefix = prefix.casefold()
+        lo = bisect_left(keys, prefix)
+        hi = bisect_right(keys, prefix + MAX_CHAR, lo)
+        result = list(rows[lo:min(hi, lo + limit)])
+        if contains and prefix and len(result) < limit:
+            for i, key in enumerate(keys):
+                if lo <= i < hi or prefix not in key:
+                    continue
+                result.append(rows[i])
+                if len(result) >= limit:
+                    break
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,313 @@
+import copy
+import logging
+import math
+import threading
+from array import array
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, connection
+
+from recipes.cache import (get_changes, get_changes_number, get_version,
+                           log_changes)
+from recipes.models import RecipeIngredient, TagInRecipe
+
+logger = logging.getLogger(__name__)
+
+VERSION = "recipe_matrix"
+# Сколько заменённых строк держать поверх сжатых массивов, прежде чем
+# собрать матрицу заново: не меньше MIN_OVERLAY и не больше 1/20 строк.
+MIN_OVERLAY = 1000
+
+
+def _csr(pairs, size):
+    """
+    Список пар (строка, значение), отсортированный по строке, в виде
+    двух массивов: offsets[i]:offsets[i + 1] — срез values строки i.
+    """
+    offsets = array("l", [0]) * (size + 1)
+    values = array("l")
+    for row, value in pairs:
+        offsets[row + 1] += 1
+        values.append(value)
+    for row in range(size):
+        offsets[row + 1] += offsets[row]
+    return offsets, values
+
+
+class RecipeMatrix:
+    """
+    Разреженная матрица «рецепт × ингредиент» в компактных массивах:
+    состав и теги рецептов, списки рецептов по ингредиентам (обратный
+    индекс) и IDF-веса ингредиентов.
+
+    Сжатые массивы после сборки не меняются. Изменённые рецепты
+    попадают в небольшой слой поверх них (updated()): строка
+    заменяется целиком, а в списки рецептов по ингредиентам она
+    добавляется отдельно от сжатой части.
+    """
+
+    def __init__(self, ingredient_rows, tag_rows):
+        recipe_ids = sorted(
+            {recipe for recipe, _ in ingredient_rows}
+            | {recipe for recipe, _ in tag_rows})
+        self.recipe_ids = array("q", recipe_ids)
+        self.positions = {pk: i for i, pk in enumerate(recipe_ids)}
+        ingredient_ids = sorted({pk for _, pk in ingredient_rows})
+        self.columns = {pk: i for i, pk in enumerate(ingredient_ids)}
+        size = len(recipe_ids)
+
+        pairs = sorted((self.positions[recipe], self.columns[ingredient])
+                       for recipe, ingredient in ingredient_rows)
+        self.offsets, self.ingredients = _csr(pairs, size)
+        self.tag_offsets, self.tags = _csr(sorted(
+            (self.positions[recipe], tag) for recipe, tag in tag_rows), size)
+        self.posting_offsets, self.postings = _csr(
+            sorted((column, row) for row, column in pairs),
+            len(ingredient_ids))
+
+        self.size = size
+        self.counts = array("l", (
+            self.posting_offsets[i + 1] - self.posting_offsets[i]
+            for i in range(len(ingredient_ids))
+        ))
+        # Слой изменений: заменённые строки, удалённые рецепты, новые
+        # рецепты и ингредиенты, добавленные в списки по ингредиентам.
+        self.rows = {}
+        self.removed = frozenset()
+        self.new_ids = ()
+        self.new_positions = {}
+        self.new_columns = {}
+        self.added = {}
+        self._set_weights()
+
+    def __len__(self):
+        return self.size
+
+    def _set_weights(self):
+        self.weights = array("d", (
+            math.log(self.size / count) + 1 if count else 0.0
+            for count in self.counts
+        ))
+
+    def position(self, recipe_id):
+        position = self.new_positions.get(recipe_id)
+        if position is None:
+            position = self.positions.get(recipe_id)
+        if position in self.removed:
+            return None
+        return position
+
+    def recipe_id(self, position):
+        if position < len(self.recipe_ids):
+            return self.recipe_ids[position]
+        return self.new_ids[position - len(self.recipe_ids)]
+
+    def column(self, ingredient_id):
+        column = self.new_columns.get(ingredient_id)
+        if column is None:
+            column = self.columns.get(ingredient_id)
+        return column
+
+    def row(self, position):
+        if position in self.rows:
+            return self.rows[position][0]
+        return self.ingredients[
+            self.offsets[position]:self.offsets[position + 1]]
+
+    def row_size(self, position):
+        if position in self.rows:
+            return len(self.rows[position][0])
+        return self.offsets[position + 1] - self.offsets[position]
+
+    def row_tags(self, position):
+        if position in self.rows:
+            return self.rows[position][1]
+        return self.tags[
+            self.tag_offsets[position]:self.tag_offsets[position + 1]]
+
+    def norm(self, position):
+        return sum(self.weights[column] for column in self.row(position))
+
+    def posting(self, column):
+        rows = ()
+        if column < len(self.posting_offsets) - 1:
+            rows = self.postings[
+                self.posting_offsets[column]:
+                self.posting_offsets[column + 1]]
+        if self.rows:
+            rows = [row for row in rows if row not in self.rows]
+        added = self.added.get(column)
+        if added:
+            rows = list(rows) + list(added)
+        return rows
+
+    def posting_size(self, column):
+        return self.counts[column]
+
+    def overlay_size(self):
+        return len(self.rows)
+
+    def updated(self, recipe_ids, ingredient_rows, tag_rows):
+        """
+        Копия матрицы, в которой строки рецептов recipe_ids заменены
+        строками ingredient_rows и tag_rows; рецепты без строк удалены.
+        Сжатые массивы общие с исходной матрицей, копируется только слой
+        изменений, поэтому исходной матрицей можно продолжать пользоваться.
+        """
+        matrix = copy.copy(self)
+        matrix.rows = dict(self.rows)
+        matrix.removed = set(self.removed)
+        matrix.new_ids = list(self.new_ids)
+        matrix.new_positions = dict(self.new_positions)
+        matrix.new_columns = dict(self.new_columns)
+        matrix.added = dict(self.added)
+        matrix.counts = array("l", self.counts)
+
+        ingredients = defaultdict(list)
+        tags = defaultdict(list)
+        for recipe, ingredient in ingredient_rows:
+            ingredients[recipe].append(ingredient)
+        for recipe, tag in tag_rows:
+            tags[recipe].append(tag)
+        for recipe_id in recipe_ids:
+            matrix._replace(
+                recipe_id, ingredients[recipe_id], tags[recipe_id])
+
+        matrix.removed = frozenset(matrix.removed)
+        matrix._set_weights()
+        return matrix
+
+    def _replace(self, recipe_id, ingredient_ids, tag_ids):
+        position = self.position(recipe_id)
+        if position is not None:
+            self.size -= 1
+            for column in self.row(position):
+                self.counts[column] -= 1
+                added = self.added.get(column)
+                if added and position in added:
+                    self.added[column] = tuple(
+                        row for row in added if row != position)
+        if not ingredient_ids and not tag_ids:
+            if position is not None:
+                self.rows[position] = ((), ())
+                self.removed.add(position)
+            return
+
+        if position is None:
+            position = self.new_positions.get(
+                recipe_id, self.positions.get(recipe_id))
+        if position is None:
+            position = len(self.recipe_ids) + len(self.new_ids)
+            self.new_ids.append(recipe_id)
+            self.new_positions[recipe_id] = position
+        self.removed.discard(position)
+        self.size += 1
+
+        columns = []
+        for ingredient_id in sorted(set(ingredient_ids)):
+            column = self.column(ingredient_id)
+            if column is None:
+                column = len(self.counts)
+                self.new_columns[ingredient_id] = column
+                self.counts.append(0)
+            self.counts[column] += 1
+            self.added[column] = self.added.get(column, ()) + (position,)
+            columns.append(column)
+        self.rows[position] = (tuple(columns), tuple(sorted(tag_ids)))
+
+
+class RecipeMatrixIndex:
+    """
+    Матрица рецептов в памяти процесса. Строится при первом обращении.
+    Изменённые рецепты записываются в журнал recipe_matrix
+    (recipes.cache), и каждый процесс при следующем обращении
+    переносит в свою матрицу только их. Заново матрица собирается
+    в фоновом потоке — когда замен накопилось много, журнал вытеснен
+    из кеша или сменилась версия recipe_matrix; до конца сборки
+    запросы обслуживает прежняя матрица.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = None
+        self._changes = 0
+        self._building = False
+
+    @staticmethod
+    def rows(recipe_ids=None):
+        # С основной базы: строки с отстающей реплики остались бы
+        # в матрице до следующей полной сборки.
+        ingredients = RecipeIngredient.objects.using(DEFAULT_DB_ALIAS)
+        tags = TagInRecipe.objects.using(DEFAULT_DB_ALIAS)
+        if recipe_ids is not None:
+            ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+            tags = tags.filter(recipe_id__in=recipe_ids)
+        return (
+            list(ingredients.values_list(
+                "recipe_id", "ingredient_id").iterator()),
+            list(tags.values_list("recipe_id", "tag_id").iterator()),
+        )
+
+    @classmethod
+    def build(cls):
+        return RecipeMatrix(*cls.rows())
+
+    def update(self, recipe_ids):
+        """Записывает изменённые рецепты в журнал для всех процессов."""
+        log_changes(VERSION, recipe_ids)
+
+    def _rebuild(self, version, changes):
+        try:
+            data = self.build()
+            with self._lock:
+                self._data, self._version = data, version
+                self._changes = changes
+        except Exception:
+            logger.exception("Не удалось перестроить матрицу рецептов")
+        finally:
+            self._building = False
+            connection.close()
+
+    def _schedule_rebuild(self, version, changes):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(
+            target=self._rebuild, args=(version, changes),
+            daemon=True).start()
+
+    def _apply_changes(self, version, changes):
+        with self._lock:
+            if changes == self._changes:
+                return
+            recipe_ids = get_changes(VERSION, self._changes, changes)
+            if recipe_ids is not None:
+                self._data = self._data.updated(
+                    recipe_ids, *self.rows(recipe_ids))
+                self._changes = changes
+        limit = max(MIN_OVERLAY, len(self._data.recipe_ids) // 20)
+        if recipe_ids is None or self._data.overlay_size() > limit:
+            self._schedule_rebuild(version, changes)
+
+    def _ensure_built(self):
+        version = get_version(VERSION)
+        changes = get_changes_number(VERSION)
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data, self._version = self.build(), version
+                    self._changes = changes
+            return
+        if version != self._version:
+            self._schedule_rebuild(version, changes)
+        elif changes != self._changes:
+            self._apply_changes(version, changes)
+
+    def get(self):
+        self._ensure_built()
+        return self._data
+
+
+recipe_matrix = RecipeMatrixIndex()
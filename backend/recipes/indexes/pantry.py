@@ -0,0 +1,54 @@
+import threading
+from collections import Counter, OrderedDict
+
+from recipes.indexes.matrix import recipe_matrix
+
+CACHE_SIZE = 128
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_matrix = None
+
+
+def rank(matrix, ingredient_ids):
+    matched = Counter()
+    for pk in ingredient_ids:
+        column = matrix.column(pk)
+        if column is not None:
+            matched.update(matrix.posting(column))
+
+    ranked = []
+    for row, count in matched.items():
+        total = matrix.row_size(row)
+        ranked.append(
+            (-count / total, total - count, -matrix.recipe_id(row), count))
+    ranked.sort()
+    return [(-pk, count, count + missing)
+            for _, missing, pk, count in ranked]
+
+
+def match_pantry(ingredient_ids):
+    """
+    Рецепты, для которых есть хотя бы один из ингредиентов, в виде
+    (id рецепта, есть ингредиентов, всего ингредиентов). Сначала идут
+    рецепты с большей долей имеющихся ингредиентов, затем с меньшим
+    числом недостающих, затем более новые. Последние результаты
+    запоминаются, чтобы листание страниц не ранжировало заново.
+    """
+    global _cache_matrix
+    matrix = recipe_matrix.get()
+    key = frozenset(ingredient_ids)
+    with _lock:
+        if _cache_matrix is not matrix:
+            _cache.clear()
+            _cache_matrix = matrix
+        elif key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    result = rank(matrix, key)
+    with _lock:
+        if _cache_matrix is matrix:
+            _cache[key] = result
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return result
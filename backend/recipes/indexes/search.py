@@ -0,0 +1,265 @@
+import heapq
+import math
+import re
+import threading
+from array import array
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import DEFAULT_DB_ALIAS, connection, models
+from django.db.models.functions import Coalesce
+
+from recipes.cache import (bump_versions, get_changes, get_changes_number,
+                           get_version, log_changes)
+from recipes.models import Recipe, RecipeIngredient
+
+VERSION = "recipe_search"
+REBUILD_CHUNK_SIZE = 1000
+
+WORD = re.compile(r"\w+")
+ENDINGS = sorted({
+    "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими",
+    "ией", "иях", "ах", "ях", "ой", "ей", "ий", "ый", "ая", "яя",
+    "ое", "ее", "ые", "ие", "ую", "юю", "ов", "ев", "ам", "ям", "ом", "ем",
+    "ия", "ии", "ью", "а", "я", "ы", "и", "о", "е", "у", "ю", "ь",
+}, key=len, reverse=True)
+MIN_STEM = 3
+
+# Вес поля: совпадение в названии важнее, чем в описании.
+FIELD_WEIGHTS = {"name": 3, "ingredients": 2, "text": 1}
+K1 = 1.2
+B = 0.75
+
+
+def stem(word):
+    """Отсекает типичное русское окончание, оставляя основу."""
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text):
+    return [stem(word) for word in
+            WORD.findall(text.casefold().replace("ё", "е"))]
+
+
+class MemorySearchIndex:
+    """
+    Обратный индекс слово -> (номер документа, вес) для BM25 в памяти
+    процесса. Документ — рецепт: название, ингредиенты и описание.
+    Изменённый рецепт получает новый номер, старый помечается
+    удалённым; когда удалённых становится много, индекс пересобирается.
+
+    Изменения пишутся в журнал recipe_search (recipes.cache), и каждый
+    процесс переносит их в свой индекс перед поиском; смена версии
+    recipe_search пересобирает индекс целиком.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version = None
+        self._changes = 0
+
+    def _reset(self):
+        self.postings = defaultdict(lambda: (array("l"), array("f")))
+        self.doc_recipes = array("q")
+        self.doc_lengths = array("f")
+        self.live = {}
+        self.total_length = 0.0
+
+    def _documents(self, recipe_ids=None):
+        # С основной базы: документ с отстающей реплики остался бы
+        # в индексе до следующей пересборки.
+        recipes = Recipe.objects.using(DEFAULT_DB_ALIAS)
+        rows = RecipeIngredient.objects.using(DEFAULT_DB_ALIAS)
+        if recipe_ids is not None:
+            recipes = recipes.filter(pk__in=recipe_ids)
+            rows = rows.filter(recipe_id__in=recipe_ids)
+        ingredients = defaultdict(list)
+        for recipe_id, name in rows.values_list(
+                "recipe_id", "ingredient__name").iterator():
+            ingredients[recipe_id].append(name)
+        for pk, name, text in recipes.values_list(
+                "pk", "name", "text").iterator():
+            yield pk, {"name": name, "text": text,
+                       "ingredients": " ".join(ingredients[pk])}
+
+    def _add(self, recipe_id, fields):
+        terms = Counter()
+        for field, value in fields.items():
+            for term in tokenize(value):
+                terms[term] += FIELD_WEIGHTS[field]
+        doc = len(self.doc_recipes)
+        self.doc_recipes.append(recipe_id)
+        length = sum(terms.values())
+        self.doc_lengths.append(length)
+        self.total_length += length
+        self.live[recipe_id] = doc
+        for term, weight in terms.items():
+            docs, weights = self.postings[term]
+            docs.append(doc)
+            weights.append(weight)
+
+    def _remove(self, recipe_id):
+        doc = self.live.pop(recipe_id, None)
+        if doc is not None:
+            self.total_length -= self.doc_lengths[doc]
+
+    def _ensure_current(self):
+        version = get_version(VERSION)
+        changes = get_changes_number(VERSION)
+        if version == self._version and changes == self._changes:
+            return
+        recipe_ids = None
+        if version == self._version:
+            recipe_ids = get_changes(VERSION, self._changes, changes)
+        if recipe_ids is None:
+            self._rebuild()
+        else:
+            self._apply(recipe_ids)
+        self._version, self._changes = version, changes
+
+    def _rebuild(self):
+        self._reset()
+        for pk, fields in self._documents():
+            self._add(pk, fields)
+
+    def _apply(self, recipe_ids):
+        """Переиндексирует рецепты; удалённые из базы пропадают из поиска."""
+        for pk in recipe_ids:
+            self._remove(pk)
+        for pk, fields in self._documents(recipe_ids):
+            self._add(pk, fields)
+        if len(self.doc_recipes) > 2 * len(self.live) + 1000:
+            self._rebuild()
+
+    def update(self, recipe_ids):
+        """Записывает изменённые рецепты в журнал для всех процессов."""
+        log_changes(VERSION, recipe_ids)
+
+    def remove(self, recipe_ids):
+        log_changes(VERSION, recipe_ids)
+
+    def search(self, query, limit):
+        """Список (id рецепта, релевантность) по убыванию релевантности."""
+        with self._lock:
+            self._ensure_current()
+            live_count = len(self.live)
+            if not live_count:
+                return []
+            average = self.total_length / live_count or 1.0
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                if term not in self.postings:
+                    continue
+                docs, weights = self.postings[term]
+                idf = math.log(
+                    1 + (live_count - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc, weight in zip(docs, weights):
+                    recipe_id = self.doc_recipes[doc]
+                    if self.live.get(recipe_id) != doc:
+                        continue
+                    norm = K1 * (1 - B + B * self.doc_lengths[doc] / average)
+                    scores[recipe_id] += idf * weight * (K1 + 1) / (
+                        weight + norm)
+            return heapq.nlargest(limit, scores.items(),
+                                  key=lambda item: (item[1], item[0]))
+
+
+class MemorySearchBackend:
+    """BM25 по индексу в памяти — для SQLite и тестов."""
+
+    def __init__(self):
+        self.index = MemorySearchIndex()
+
+    def filter(self, queryset, query):
+        limit = getattr(settings, "RECIPE_SEARCH_LIMIT", 1000)
+        ranked = self.index.search(query, limit)
+        if not ranked:
+            return queryset.none()
+        return queryset.filter(pk__in=[pk for pk, _ in ranked]).annotate(
+            search_rank=models.Case(
+                *(models.When(pk=pk, then=models.Value(score))
+                  for pk, score in ranked),
+                output_field=models.FloatField(),
+            ),
+        ).order_by("-search_rank", "-id")
+
+    def update(self, recipe_ids):
+        self.index.update(recipe_ids)
+
+    def remove(self, recipe_ids):
+        self.index.remove(recipe_ids)
+
+    def rebuild(self):
+        bump_versions(VERSION)
+
+
+class PostgresSearchBackend:
+    """
+    Полнотекстовый поиск PostgreSQL: поле Recipe.search_vector
+    с GIN-индексом, словарь russian.
+    """
+    config = "russian"
+
+    def filter(self, queryset, query):
+        query = SearchQuery(
+            query, config=self.config, search_type="websearch")
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(models.F("search_vector"), query),
+        ).order_by("-search_rank", "-id")
+
+    def vector(self):
+        ingredients = Coalesce(models.Subquery(
+            RecipeIngredient.objects.filter(recipe_id=models.OuterRef("pk"))
+            .order_by()
+            .values("recipe_id")
+            .annotate(names=StringAgg("ingredient__name", " "))
+            .values("names")
+        ), models.Value(""))
+        return (
+            SearchVector("name", weight="A", config=self.config)
+            + SearchVector(ingredients, weight="B", config=self.config)
+            + SearchVector("text", weight="C", config=self.config)
+        )
+
+    def update(self, recipe_ids):
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            search_vector=self.vector())
+
+    def remove(self, recipe_ids):
+        pass
+
+    def rebuild(self):
+        ids = Recipe.objects.values_list("pk", flat=True).iterator()
+        while True:
+            chunk = list(islice(ids, REBUILD_CHUNK_SIZE))
+            if not chunk:
+                break
+            self.update(chunk)
+
+
+BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "memory": MemorySearchBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    """
+    Бэкенд из RECIPE_SEARCH_BACKEND; по умолчанию PostgreSQL,
+    если база — PostgreSQL, иначе индекс в памяти.
+    """
+    global _backend
+    if _backend is None:
+        name = getattr(settings, "RECIPE_SEARCH_BACKEND", "") or (
+            "postgresql" if connection.vendor == "postgresql" else "memory")
+        _backend = BACKENDS[name]()
+    return _backend
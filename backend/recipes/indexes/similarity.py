@@ -0,0 +1,56 @@
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+
+from recipes.indexes.matrix import recipe_matrix
+
+
+def similar_recipes(recipe_id, limit):
+    """
+    id рецептов, похожих на данный: взвешенный коэффициент Жаккара
+    составов с добавкой за общие теги, самые похожие первыми.
+    """
+    matrix = recipe_matrix.get()
+    position = matrix.position(recipe_id)
+    if position is None:
+        return []
+    ingredients = matrix.row(position)
+    max_df = max(1, int(len(matrix) * getattr(
+        settings, "SIMILAR_RECIPES_MAX_DF", 0.05)))
+
+    # Кандидатов дают сначала редкие ингредиенты: у соли и муки списки
+    # длинные, а вклад в сходство маленький. Частые берутся, только
+    # если редкие дали меньше limit кандидатов — например, когда
+    # единственный редкий ингредиент больше ни у кого не встречается.
+    overlap = defaultdict(float)
+    for column in sorted(ingredients, key=matrix.posting_size):
+        if (matrix.posting_size(column) > max_df
+                and len(overlap) - (position in overlap) >= limit):
+            break
+        weight = matrix.weights[column]
+        for row in matrix.posting(column):
+            overlap[row] += weight
+    overlap.pop(position, None)
+    candidates = heapq.nlargest(
+        max(limit * 10, 50), overlap, key=overlap.__getitem__)
+
+    ingredients = set(ingredients)
+    tags = set(matrix.row_tags(position))
+    tag_boost = getattr(settings, "SIMILAR_RECIPES_TAG_BOOST", 0.2)
+    norm = matrix.norm(position)
+    scored = []
+    for row in candidates:
+        shared = other_norm = 0.0
+        for column in matrix.row(row):
+            weight = matrix.weights[column]
+            other_norm += weight
+            if column in ingredients:
+                shared += weight
+        score = shared / (norm + other_norm - shared)
+        other_tags = set(matrix.row_tags(row))
+        if tags or other_tags:
+            score += tag_boost * (
+                len(tags & other_tags) / len(tags | other_tags))
+        scored.append((score, -matrix.recipe_id(row)))
+    return [-pk for _, pk in heapq.nlargest(limit, scored)]
@@ -0,0 +1,232 @@
+import json
+import random
+import re
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+ENDPOINTS = {
+    "recipes": ("/api/recipes/", False),
+    "recipes_auth": ("/api/recipes/", True),
+    "recipes_page_50": ("/api/recipes/?page=50", False),
+    "recipes_cursor": ("/api/recipes/?cursor=", False),
+    "recipes_by_tag": ("/api/recipes/?tags={tag}", False),
+    "recipe_detail": ("/api/recipes/{recipe}/", False),
+    "recipes_search": ("/api/recipes/?search={word}", False),
+    "subscriptions": ("/api/users/subscriptions/?recipes_limit=3", True),
+    "ingredients_search": ("/api/ingredients/?name={prefix}", False),
+    "download_shopping_cart": ("/api/recipes/download_shopping_cart/", True),
+}
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def test_client(**kwargs):
+    """Тестовый клиент с хостом из ALLOWED_HOSTS, чтобы пройти проверку."""
+    host = next((host.lstrip(".") for host in settings.ALLOWED_HOSTS
+                 if host != "*"), "localhost")
+    return Client(HTTP_HOST=host, **kwargs)
+
+
+def percentile(values, percent):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[
+        percent - 1]
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный прогон основных эндпоинтов через тестовый клиент "
+            "Django или запущенный сервер: задержки p50/p95/p99, "
+            "пропускная способность и число SQL-запросов на запрос.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--endpoints", default=",".join(ENDPOINTS),
+            help="Через запятую: " + ", ".join(ENDPOINTS))
+        parser.add_argument(
+            "--concurrency", default="1,4",
+            help="Уровни параллельности через запятую.")
+        parser.add_argument(
+            "--requests", type=int, default=200,
+            help="Запросов на эндпоинт при каждом уровне параллельности.")
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument(
+            "--base-url",
+            help="Адрес запущенного сервера, например http://localhost:8000."
+                 " Без него запросы идут через тестовый клиент.")
+        parser.add_argument(
+            "--cold-cache", action="store_true",
+            help="Очищать кеш перед каждым прогоном.")
+        parser.add_argument(
+            "--output", help="Записать результаты в JSON-файл.")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options["endpoints"].split(",")]
+        unknown = set(names) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(
+                f"Неизвестные эндпоинты: {', '.join(sorted(unknown))}")
+        try:
+            levels = [int(level) for level in
+                      options["concurrency"].split(",")]
+        except ValueError:
+            raise CommandError("--concurrency: ожидаются целые числа.")
+        self.base_url = options["base_url"]
+        self.rng = random.Random(options["seed"])
+        self.rng_lock = threading.Lock()
+        self.prepare_fixtures()
+
+        results = []
+        for name in names:
+            for level in levels:
+                if options["cold_cache"]:
+                    cache.clear()
+                self.run(name, 1, options["warmup"])
+                result = self.run(name, level, options["requests"])
+                results.append(result)
+                self.report(result)
+
+        if options["output"]:
+            report = {"meta": self.meta(options), "results": results}
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f"Результаты записаны в {options['output']}"))
+
+    def prepare_fixtures(self):
+        self.recipe_ids = list(
+            Recipe.objects.order_by("?").values_list("pk", flat=True)[:1000])
+        self.tags = list(Tag.objects.values_list("slug", flat=True))
+        names = list(Ingredient.objects.order_by("?").values_list(
+            "name", flat=True)[:200])
+        self.prefixes = [name[:3] for name in names]
+        self.words = [name.split()[0] for name in names]
+        if not self.recipe_ids or not self.tags or not names:
+            raise CommandError(
+                "Нет данных для прогона, сначала выполните generate_data.")
+        user = (User.objects.filter(is_active=True)
+                .order_by("-subscriptions_count", "pk").first())
+        self.token = Token.objects.get_or_create(user=user)[0].key
+
+    def url(self, name):
+        template, _ = ENDPOINTS[name]
+        with self.rng_lock:
+            return template.format(
+                recipe=self.rng.choice(self.recipe_ids),
+                tag=self.rng.choice(self.tags),
+                prefix=quote(self.rng.choice(self.prefixes)),
+                word=quote(self.rng.choice(self.words)),
+            )
+
+    def request(self, client, name):
+        """Возвращает (секунды, статус, число SQL-запросов или None)."""
+        url = self.url(name)
+        authenticated = ENDPOINTS[name][1]
+        if self.base_url:
+            headers = ({"Authorization": f"Token {self.token}"}
+                       if authenticated else {})
+            started = time.perf_counter()
+            try:
+                with urlopen(Request(self.base_url + url,
+                                     headers=headers)) as response:
+                    response.read()
+                    status = response.status
+                    timing = response.headers.get("Server-Timing", "")
+            except HTTPError as error:
+                status, timing = error.code, ""
+            elapsed = time.perf_counter() - started
+            match = SERVER_TIMING_QUERIES.search(timing)
+            return elapsed, status, int(match.group(1)) if match else None
+
+        extra = ({"HTTP_AUTHORIZATION": f"Token {self.token}"}
+                 if authenticated else {})
+        queries = []
+        started = time.perf_counter()
+        with connection.execute_wrapper(
+                lambda execute, *args: queries.append(1) or execute(*args)):
+            response = client.get(url, **extra)
+            if getattr(response, "streaming", False):
+                b"".join(response.streaming_content)
+        return time.perf_counter() - started, response.status_code, len(
+            queries)
+
+    def worker(self, name, count):
+        client = None if self.base_url else test_client()
+        samples = [self.request(client, name) for _ in range(count)]
+        connection.close()
+        return samples
+
+    def run(self, name, concurrency, total):
+        per_worker = [total // concurrency + (i < total % concurrency)
+                      for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            batches = list(executor.map(
+                lambda count: self.worker(name, count), per_worker))
+        wall = time.perf_counter() - started
+        samples = [sample for batch in batches for sample in batch]
+        latencies = sorted(elapsed * 1000 for elapsed, _, _ in samples)
+        queries = [count for _, _, count in samples if count is not None]
+        return {
+            "endpoint": name,
+            "concurrency": concurrency,
+            "requests": len(samples),
+            "errors": sum(status >= 400 for _, status, _ in samples),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "mean_ms": round(statistics.fmean(latencies), 2),
+            "throughput_rps": round(len(samples) / wall, 1),
+            "queries_per_request": (round(statistics.fmean(queries), 2)
+                                    if queries else None),
+        }
+
+    def report(self, result):
+        queries = result["queries_per_request"]
+        self.stdout.write(
+            f"{result['endpoint']:<24} c={result['concurrency']:<3} "
+            f"p50 {result['p50_ms']:>8.2f} мс  "
+            f"p95 {result['p95_ms']:>8.2f} мс  "
+            f"p99 {result['p99_ms']:>8.2f} мс  "
+            f"{result['throughput_rps']:>7.1f} rps  "
+            f"SQL {queries if queries is not None else '—'}  "
+            f"ошибок {result['errors']}"
+        )
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "HEAD"], capture_output=True,
+                text=True, cwd=settings.BASE_DIR, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            "commit": commit,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "mode": "server" if self.base_url else "test_client",
+            "database": connection.vendor,
+            "recipes": Recipe.objects.count(),
+            "users": User.objects.count(),
+            "requests": options["requests"],
+            "cold_cache": options["cold_cache"],
+        }
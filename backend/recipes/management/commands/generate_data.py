@@ -0,0 +1,225 @@
+import io
+import random
+import time
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.cache import bump_versions
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag, TagInRecipe)
+from users.models import Subscription
+
+User = get_user_model()
+
+PASSWORD = "benchmark-password"
+WORDS = (
+    "домашний", "быстрый", "острый", "сытный", "летний", "праздничный",
+    "бабушкин", "постный", "пряный", "нежный", "хрустящий", "ароматный",
+)
+DISHES = (
+    "суп", "салат", "пирог", "рагу", "омлет", "плов", "гуляш", "запеканка",
+    "паста", "каша", "борщ", "котлеты", "блины", "соус", "десерт",
+)
+
+
+def zipf_weights(size, exponent):
+    """Накопленные веса закона Ципфа: первые элементы самые популярные."""
+    return list(accumulate(1 / (rank ** exponent)
+                           for rank in range(1, size + 1)))
+
+
+def sample_unique(rng, population, cum_weights, count):
+    """До count разных элементов с учётом популярности."""
+    count = min(count, len(population))
+    chosen = set()
+    for _ in range(count * 3):
+        chosen.update(rng.choices(population, cum_weights=cum_weights,
+                                  k=count - len(chosen)))
+        if len(chosen) >= count:
+            break
+    return chosen
+
+
+class Command(BaseCommand):
+    help = ("Создаёт синтетические данные для нагрузочного тестирования: "
+            "пользователей, рецепты, теги, избранное, корзины и подписки "
+            "с неравномерной популярностью.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--recipes", type=int, default=10000)
+        parser.add_argument("--tags", type=int, default=12)
+        parser.add_argument(
+            "--ingredients-per-recipe", type=int, default=8,
+            help="Среднее число ингредиентов в рецепте.")
+        parser.add_argument(
+            "--favorites-per-user", type=int, default=20,
+            help="Среднее число рецептов в избранном.")
+        parser.add_argument(
+            "--carts-per-user", type=int, default=3,
+            help="Среднее число рецептов в корзине.")
+        parser.add_argument(
+            "--subscriptions-per-user", type=int, default=5,
+            help="Среднее число подписок.")
+        parser.add_argument(
+            "--skew", type=float, default=1.1,
+            help="Показатель закона Ципфа для популярности авторов, "
+                 "рецептов и ингредиентов.")
+        parser.add_argument(
+            "--ingredients-file",
+            default=str(settings.BASE_DIR.parent / "data" / "ingredients.csv"),
+            help="Откуда загрузить ингредиенты, если таблица пуста.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        started = time.perf_counter()
+
+        if not Ingredient.objects.exists():
+            call_command("load_ingredients", options["ingredients_file"],
+                         stdout=self.stdout)
+        ingredient_ids = list(Ingredient.objects.values_list("pk", flat=True))
+        if not ingredient_ids:
+            raise CommandError("Нет ингредиентов для рецептов.")
+        self.rng.shuffle(ingredient_ids)
+
+        with transaction.atomic():
+            tag_ids = self.create_tags(options["tags"])
+            user_ids = self.create_users(options["users"])
+            recipe_ids = self.create_recipes(
+                options["recipes"], user_ids, tag_ids, ingredient_ids)
+            self.create_relations(user_ids, recipe_ids)
+
+        # Данные записаны в обход сигналов: пересчитываем производное.
+        call_command("reconcile_counters", stdout=io.StringIO())
+        call_command("rebuild_shopping_lists", stdout=io.StringIO())
+        call_command("rebuild_search_index", stdout=io.StringIO())
+        bump_versions("recipes", "tags", "recipe_matrix")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано за {time.perf_counter() - started:.1f} с: "
+            f"пользователей {len(user_ids)}, рецептов {len(recipe_ids)}. "
+            f"Пароль пользователей: {PASSWORD}"))
+
+    def bulk_create(self, model, objects, **kwargs):
+        objects = list(objects)
+        for start in range(0, len(objects), self.batch_size):
+            model.objects.bulk_create(
+                objects[start:start + self.batch_size], **kwargs)
+
+    def create_tags(self, count):
+        existing = Tag.objects.count()
+        self.bulk_create(Tag, (
+            Tag(name=f"Тег {number}", slug=f"tag-{number}")
+            for number in range(existing, count)
+        ), ignore_conflicts=True)
+        return list(Tag.objects.values_list("pk", flat=True))
+
+    def create_users(self, count):
+        start = User.objects.filter(username__startswith="bench").count()
+        password = make_password(PASSWORD)
+        self.bulk_create(User, (
+            User(
+                username=f"bench{number}",
+                email=f"bench{number}@example.com",
+                first_name="Тест",
+                last_name=f"Пользователь {number}",
+                password=password,
+            )
+            for number in range(start, start + count)
+        ))
+        return list(
+            User.objects.filter(username__startswith="bench")
+            .order_by("pk").values_list("pk", flat=True)[start:])
+
+    def placeholder_image(self):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (640, 480), (230, 180, 120)).save(buffer, "JPEG")
+        return default_storage.save(
+            f"{Recipe._meta.get_field('image').upload_to}bench.jpg",
+            ContentFile(buffer.getvalue()))
+
+    def create_recipes(self, count, user_ids, tag_ids, ingredient_ids):
+        rng = self.rng
+        image = self.placeholder_image()
+        author_weights = zipf_weights(len(user_ids), self.options["skew"])
+        authors = rng.choices(user_ids, cum_weights=author_weights, k=count)
+        first_id = (Recipe.objects.order_by("-pk")
+                    .values_list("pk", flat=True).first() or 0)
+        self.bulk_create(Recipe, (
+            Recipe(
+                author_id=author,
+                name=f"{rng.choice(WORDS).capitalize()} "
+                     f"{rng.choice(DISHES)} №{number}",
+                text=" ".join(rng.choices(WORDS + DISHES, k=30)),
+                cooking_time=max(1, int(rng.lognormvariate(3.3, 0.6))),
+                image=image,
+            )
+            for number, author in enumerate(authors)
+        ))
+        recipe_ids = list(Recipe.objects.filter(pk__gt=first_id)
+                          .order_by("pk").values_list("pk", flat=True))
+
+        ingredient_weights = zipf_weights(
+            len(ingredient_ids), self.options["skew"])
+        average = self.options["ingredients_per_recipe"]
+        rows = []
+        tags = []
+        for recipe_id in recipe_ids:
+            size = max(1, int(rng.triangular(1, average * 2, average)))
+            for pk in sample_unique(rng, ingredient_ids,
+                                    ingredient_weights, size):
+                rows.append(RecipeIngredient(
+                    recipe_id=recipe_id, ingredient_id=pk,
+                    amount=rng.randint(1, 500)))
+            for pk in rng.sample(tag_ids, min(len(tag_ids),
+                                              rng.randint(1, 3))):
+                tags.append(TagInRecipe(recipe_id=recipe_id, tag_id=pk))
+            if len(rows) >= self.batch_size:
+                self.bulk_create(RecipeIngredient, rows)
+                rows = []
+        self.bulk_create(RecipeIngredient, rows)
+        self.bulk_create(TagInRecipe, tags)
+        return recipe_ids
+
+    def create_relations(self, user_ids, recipe_ids):
+        rng = self.rng
+        skew = self.options["skew"]
+        popular_recipes = recipe_ids[:]
+        rng.shuffle(popular_recipes)
+        recipe_weights = zipf_weights(len(popular_recipes), skew)
+        author_weights = zipf_weights(len(user_ids), skew)
+        relations = (
+            (Favorite, "recipe_id", popular_recipes, recipe_weights,
+             self.options["favorites_per_user"]),
+            (ShoppingCart, "recipe_id", popular_recipes, recipe_weights,
+             self.options["carts_per_user"]),
+            (Subscription, "author_id", user_ids, author_weights,
+             self.options["subscriptions_per_user"]),
+        )
+        for model, field, population, weights, average in relations:
+            if not average or not population:
+                continue
+            objects = []
+            for user_id in user_ids:
+                size = int(rng.expovariate(1 / average))
+                for pk in sample_unique(rng, population, weights, size):
+                    if pk != user_id or model is not Subscription:
+                        objects.append(model(user_id=user_id, **{field: pk}))
+                if len(objects) >= self.batch_size:
+                    self.bulk_create(model, objects, ignore_conflicts=True)
+                    objects = []
+            self.bulk_create(model, objects, ignore_conflicts=True)
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_derivatives
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Создаёт недостающие уменьшенные копии изображений "
+            "рецептов и аватаров.")
+
+    def handle(self, *args, **options):
+        names = (
+            Recipe.objects.exclude(image="")
+            .values_list("image", flat=True).iterator(),
+            User.objects.exclude(avatar="")
+            .values_list("avatar", flat=True).iterator(),
+        )
+        done = failed = 0
+        for queryset in names:
+            for name in queryset:
+                try:
+                    generate_derivatives(default_storage.path(name),
+                                         str(settings.MEDIA_ROOT), name)
+                    done += 1
+                except OSError as error:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано: {done}, с ошибками: {failed}."))
@@ -0,0 +1,170 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.constants import MAX_ING_NAME, MAX_MEASUREMENT_UNIT
+from recipes.cache import bump_versions_on_commit
+from recipes.models import Ingredient
+
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if not row or row == ["name", "measurement_unit"]:
+            continue
+        if len(row) != 2:
+            raise CommandError(f"Ожидалось два столбца, получено: {row}")
+        yield row[0], row[1]
+
+
+def iter_json(file):
+    """Читает JSON-массив объектов по частям, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+    started = False
+    while True:
+        buffer = buffer.lstrip()
+        if started:
+            buffer = buffer.lstrip(",").lstrip()
+        if not started and buffer:
+            if buffer[0] != "[":
+                raise CommandError("JSON-файл должен содержать массив.")
+            buffer = buffer[1:]
+            started = True
+            continue
+        if started and buffer.startswith("]"):
+            return
+        try:
+            obj, end = decoder.raw_decode(buffer) if buffer else (None, 0)
+        except json.JSONDecodeError:
+            end = 0
+        if end:
+            buffer = buffer[end:]
+            fields = obj.get("fields", obj)
+            yield fields["name"], fields["measurement_unit"]
+            continue
+        if eof:
+            if buffer or not started:
+                raise CommandError("Некорректный JSON-файл.")
+            return
+        chunk = file.read(CHUNK_SIZE)
+        eof = not chunk
+        buffer += chunk
+
+
+class Command(BaseCommand):
+    help = "Загружает ингредиенты из CSV- или JSON-файла."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к ingredients.csv/.json")
+        parser.add_argument(
+            "--format", choices=("csv", "json"),
+            help="Формат файла; по умолчанию определяется по расширению.")
+        parser.add_argument(
+            "--batch-size", type=int, default=5000,
+            help="Количество строк в одном INSERT.")
+        parser.add_argument(
+            "--upsert", action="store_true",
+            help="Обновлять единицу измерения у ингредиентов "
+                 "с тем же названием.")
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Выполнить загрузку в транзакции и откатить её.")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        readers = {"csv": iter_csv, "json": iter_json}
+        if file_format not in readers:
+            raise CommandError(f"Неизвестный формат файла: {path.name}")
+        if not path.exists():
+            raise CommandError(f"Файл не найден: {path}")
+
+        self.stats = {"read": 0, "skipped": 0, "updated": 0}
+        self.ambiguous = set()
+        started = time.perf_counter()
+        with path.open(encoding="utf-8", newline="") as file:
+            with transaction.atomic():
+                count_before = Ingredient.objects.count()
+                rows = self.clean_rows(readers[file_format](file))
+                while True:
+                    batch = list(islice(rows, options["batch_size"]))
+                    if not batch:
+                        break
+                    self.load_batch(batch, options["upsert"])
+                created = Ingredient.objects.count() - count_before
+                # bulk_create и bulk_update не вызывают сигналы; по этой
+                # версии индекс ингредиентов в памяти собирается заново.
+                bump_versions_on_commit("ingredients", "recipes")
+                if options["dry_run"]:
+                    transaction.set_rollback(True)
+
+        elapsed = time.perf_counter() - started
+        rate = self.stats["read"] / elapsed if elapsed else 0
+        prefix = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Прочитано: {self.stats['read']}, "
+            f"добавлено: {created}, обновлено: {self.stats['updated']}, "
+            f"пропущено: {self.stats['skipped']} "
+            f"за {elapsed:.2f} с ({rate:.0f} строк/с)."
+        ))
+        if self.ambiguous:
+            names = ", ".join(sorted(self.ambiguous)[:10])
+            self.stderr.write(self.style.WARNING(
+                f"Единица измерения не обновлена у {len(self.ambiguous)} "
+                f"ингредиентов с несколькими единицами в файле: {names}"))
+
+    def clean_rows(self, rows):
+        for name, unit in rows:
+            self.stats["read"] += 1
+            name, unit = name.strip(), unit.strip()
+            if (not name or not unit or len(name) > MAX_ING_NAME
+                    or len(unit) > MAX_MEASUREMENT_UNIT):
+                self.stats["skipped"] += 1
+                continue
+            yield name, unit
+
+    def load_batch(self, batch, upsert):
+        if upsert:
+            batch = self.update_existing(batch)
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=unit)
+             for name, unit in batch],
+            ignore_conflicts=True,
+        )
+
+    def update_existing(self, batch):
+        units = {}
+        for name, unit in batch:
+            units.setdefault(name, set()).add(unit)
+        # Название с разными единицами в одной пачке — неясно, какую
+        # оставить: такие строки только добавляются, как без --upsert.
+        ambiguous = {name for name, values in units.items()
+                     if len(values) > 1}
+        self.ambiguous |= ambiguous
+        existing = {}
+        for ingredient in Ingredient.objects.filter(
+                name__in=units.keys() - ambiguous):
+            existing.setdefault(ingredient.name, []).append(ingredient)
+        changed = []
+        for name, ingredients in existing.items():
+            if len(ingredients) != 1:
+                continue
+            ingredient = ingredients[0]
+            unit, = units[name]
+            if ingredient.measurement_unit != unit:
+                ingredient.measurement_unit = unit
+                changed.append(ingredient)
+        Ingredient.objects.bulk_update(changed, ["measurement_unit"])
+        self.stats["updated"] += len(changed)
+        return [
+            (name, unit) for name, unit in batch
+            if name not in existing or len(existing[name]) != 1
+        ]
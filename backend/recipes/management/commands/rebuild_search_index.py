@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.indexes.search import get_backend
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает поисковый индекс рецептов, например после "
+            "массовой загрузки данных в обход моделей.")
+
+    def handle(self, *args, **options):
+        get_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Поисковый индекс обновлён для {Recipe.objects.count()} "
+            f"рецептов."))
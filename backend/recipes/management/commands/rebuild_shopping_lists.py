@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Sum
+from django.core.management.base import BaseCommand
+
+from recipes.models import RecipeIngredient, ShoppingListItem
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает списки покупок из корзин и сообщает "
+            "о расхождениях с сохранёнными итогами.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Количество пользователей, обрабатываемых за раз.")
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только показать расхождения, ничего не исправлять.")
+
+    def handle(self, *args, **options):
+        drift = {"missing": 0, "extra": 0, "wrong": 0}
+        user_ids = User.objects.order_by("pk").values_list("pk", flat=True)
+        batch = []
+        for user_id in user_ids.iterator():
+            batch.append(user_id)
+            if len(batch) >= options["batch_size"]:
+                self.reconcile(batch, drift, options["dry_run"])
+                batch = []
+        if batch:
+            self.reconcile(batch, drift, options["dry_run"])
+
+        total = sum(drift.values())
+        message = (f"Отсутствовало: {drift['missing']}, лишних: "
+                   f"{drift['extra']}, с неверным итогом: {drift['wrong']}.")
+        if total and not options["dry_run"]:
+            message += " Исправлено."
+        style = self.style.WARNING if total else self.style.SUCCESS
+        self.stdout.write(style(message))
+
+    def reconcile(self, user_ids, drift, dry_run):
+        expected = {
+            (row["user_id"], row["ingredient_id"]): row["total"]
+            for row in RecipeIngredient.objects
+            .filter(recipe__in_carts__user_id__in=user_ids)
+            .values("ingredient_id", user_id=F("recipe__in_carts__user"))
+            .annotate(total=Sum("amount"))
+            .order_by()
+        }
+        stored = {
+            (row.user_id, row.ingredient_id): row
+            for row in ShoppingListItem.objects.filter(user_id__in=user_ids)
+        }
+        missing = [key for key in expected if key not in stored]
+        extra = [row.pk for key, row in stored.items() if key not in expected]
+        wrong = [
+            row for key, row in stored.items()
+            if key in expected and row.total != expected[key]
+        ]
+        drift["missing"] += len(missing)
+        drift["extra"] += len(extra)
+        drift["wrong"] += len(wrong)
+        if dry_run:
+            return
+
+        for row in wrong:
+            row.total = expected[(row.user_id, row.ingredient_id)]
+        with transaction.atomic():
+            ShoppingListItem.objects.filter(pk__in=extra).delete()
+            ShoppingListItem.objects.bulk_update(wrong, ["total"])
+            ShoppingListItem.objects.bulk_create(
+                ShoppingListItem(user_id=user_id, ingredient_id=pk,
+                                 total=expected[(user_id, pk)])
+                for user_id, pk in missing
+            )
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription
+
+User = get_user_model()
+
+
+def count_of(model, field):
+    return Coalesce(Subquery(
+        model.objects
+        .filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(count=Count("pk"))
+        .values("count")
+    ), 0)
+
+
+COUNTERS = (
+    (Recipe, "favorites_count", Favorite, "recipe"),
+    (Recipe, "in_carts_count", ShoppingCart, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "subscribers_count", Subscription, "author"),
+    (User, "subscriptions_count", Subscription, "user"),
+)
+
+
+class Command(BaseCommand):
+    help = "Сверяет счётчики рецептов и пользователей с фактическими данными."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только показать расхождения, ничего не исправлять.")
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, field, source, source_field in COUNTERS:
+            drifted = (
+                model.objects
+                .annotate(actual=count_of(source, source_field))
+                .exclude(**{field: F("actual")})
+                .values_list("pk", flat=True)
+            )
+            pks = list(drifted)
+            total += len(pks)
+            if pks:
+                self.stdout.write(self.style.WARNING(
+                    f"{model.__name__}.{field}: расхождений {len(pks)}"))
+            if pks and not options["dry_run"]:
+                model.objects.filter(pk__in=pks).update(
+                    **{field: count_of(source, source_field)})
+        if not total:
+            self.stdout.write(self.style.SUCCESS("Счётчики в порядке."))
+        elif not options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS("Счётчики исправлены."))
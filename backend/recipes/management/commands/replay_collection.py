@@ -0,0 +1,398 @@
+import json
+import re
+import statistics
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.management.commands.benchmark import (SERVER_TIMING_QUERIES,
+                                                   percentile, test_client)
+
+User = get_user_model()
+
+COLLECTION_DIR = settings.BASE_DIR.parent / "postman_collection"
+VARIABLE = re.compile(r"{{\s*([\w$]+)\s*}}")
+EXPECTED_STATUS = re.compile(r"Статус-код ответа должен быть (\d{3})")
+ALIAS = re.compile(
+    r"(?:const|let|var)\s+(\w+)\s*=\s*_\.get\(\s*responseData\s*,"
+    r"\s*[\"']([\w.\[\]]+)[\"']\s*\)")
+SET_VARIABLE = re.compile(
+    r"pm\.collectionVariables\.set\(\s*[\"'](\w+)[\"']\s*,\s*(.+?)\)\s*;?\s*$",
+    re.M)
+ACCESSOR = re.compile(
+    r"\[(\d+)\]|\.slice\(\s*(\d+)\s*,\s*(\d+)\s*\)|\.(\w+)")
+CLEAR_USERNAMES = re.compile(r"usernames_list\s*=\s*\[([^\]]*)\]")
+# Переменные с именами и почтами пользователей: при параллельном
+# прогоне у каждого потока свои пользователи.
+PER_WORKER = re.compile(r"(?i)^(?!tooLong).*(username|email)$")
+
+
+def resolve(expression, data, aliases):
+    """
+    Значение выражения из тестового скрипта вида responseData[0].name,
+    _.get(responseData, "id") или .slice(0, 1); None, если его нет.
+    """
+    expression = expression.strip()
+    if expression in aliases:
+        expression = "responseData." + aliases[expression]
+    if not expression.startswith("responseData"):
+        return None
+    value, rest = data, expression[len("responseData"):]
+    position = 0
+    for match in ACCESSOR.finditer(rest):
+        if match.start() != position:
+            return None
+        position = match.end()
+        index, start, stop, key = match.groups()
+        try:
+            if index is not None:
+                value = value[int(index)]
+            elif start is not None:
+                value = value[int(start):int(stop)]
+            else:
+                value = value[key]
+        except (LookupError, TypeError):
+            return None
+    return value if position == len(rest) else None
+
+
+def load_collection(path):
+    """
+    Запросы коллекции в порядке выполнения. Авторизация наследуется
+    от папок, ожидаемый статус и сохраняемые переменные берутся
+    из тестовых скриптов.
+    """
+    with open(path, encoding="utf-8") as file:
+        collection = json.load(file)
+    variables = {variable["key"]: variable.get("value", "")
+                 for variable in collection.get("variable", ())}
+    requests = []
+
+    def walk(items, prefix, auth):
+        for item in items:
+            name = f"{prefix}/{item['name']}"
+            item_auth = item.get("auth") or item.get(
+                "request", {}).get("auth") or auth
+            if "item" in item:
+                walk(item["item"], name, item_auth)
+                continue
+            script = "\n".join(
+                line for event in item.get("event", ())
+                if event.get("listen") == "test"
+                for line in event["script"].get("exec", ()))
+            expected = EXPECTED_STATUS.search(script)
+            request = item["request"]
+            url = request["url"]
+            body = request.get("body") or {}
+            requests.append({
+                "name": name.lstrip("/"),
+                "method": request["method"],
+                "url": url["raw"] if isinstance(url, dict) else url,
+                "headers": {header["key"]: header["value"]
+                            for header in request.get("header", ())
+                            if not header.get("disabled")},
+                "body": body.get("raw") if body.get("mode") == "raw" else None,
+                "auth": item_auth,
+                "expected": int(expected.group(1)) if expected else None,
+                "aliases": dict(ALIAS.findall(script)),
+                "setters": SET_VARIABLE.findall(script),
+            })
+
+    walk(collection["item"], "", collection.get("auth"))
+    return variables, requests
+
+
+def substitute(text, variables):
+    return VARIABLE.sub(
+        lambda match: str(variables.get(match.group(1), match.group(0))),
+        text)
+
+
+class Command(BaseCommand):
+    help = ("Прогоняет Postman-коллекцию без Newman: задержка и число "
+            "SQL-запросов для каждого запроса, сравнение с сохранённым "
+            "базовым прогоном.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--collection",
+            default=str(COLLECTION_DIR / "foodgram.postman_collection.json"))
+        parser.add_argument(
+            "--base-url",
+            help="Адрес запущенного сервера, например http://localhost:8000."
+                 " Без него запросы идут через тестовый клиент.")
+        parser.add_argument(
+            "--repeat", type=int, default=1,
+            help="Сколько раз прогнать коллекцию.")
+        parser.add_argument(
+            "--parallel", type=int, default=1,
+            help="Сколько копий коллекции выполнять одновременно; у каждой "
+                 "копии свои пользователи.")
+        parser.add_argument(
+            "--no-reset", action="store_true",
+            help="Не удалять пользователей коллекции перед прогоном "
+                 "(как clear_db.sh).")
+        parser.add_argument(
+            "--output", help="Записать результаты в JSON-файл; его можно "
+                             "использовать как базовый прогон.")
+        parser.add_argument(
+            "--baseline", help="JSON базового прогона для сравнения.")
+        parser.add_argument(
+            "--latency-tolerance", type=float, default=0.5,
+            help="Допустимый относительный рост медианы задержки.")
+        parser.add_argument(
+            "--latency-slack-ms", type=float, default=5.0,
+            help="Рост задержки меньше этого значения не считается "
+                 "регрессией.")
+        parser.add_argument(
+            "--query-tolerance", type=int, default=0,
+            help="Допустимый рост числа SQL-запросов.")
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1 or options["parallel"] < 1:
+            raise CommandError("--repeat и --parallel должны быть больше 0.")
+        try:
+            variables, requests = load_collection(options["collection"])
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f"Не удалось прочитать коллекцию: {error}")
+        self.base_url = (options["base_url"] or "").rstrip("/")
+        variables["baseUrl"] = self.base_url
+        workers = [self.worker_variables(variables, number)
+                   for number in range(options["parallel"])]
+        self.usernames = self.collection_usernames(workers)
+
+        samples = defaultdict(list)
+        failures = {}
+        lock = threading.Lock()
+
+        def replay(worker):
+            for name, sample in self.replay(requests, worker):
+                with lock:
+                    samples[name].append(sample)
+                    _, status, expected, _ = sample
+                    if expected is not None and status != expected:
+                        failures.setdefault(name, (expected, status))
+
+        started = time.perf_counter()
+        for _ in range(options["repeat"]):
+            if not options["no_reset"]:
+                self.reset()
+            with ThreadPoolExecutor(max_workers=len(workers)) as executor:
+                list(executor.map(replay, workers))
+        wall = time.perf_counter() - started
+        if not options["no_reset"]:
+            self.reset()
+
+        results = {request["name"]: self.summary(samples[request["name"]])
+                   for request in requests if samples[request["name"]]}
+        for name, result in results.items():
+            self.report(name, result)
+        self.stdout.write(
+            f"Запросов: {sum(map(len, samples.values()))} "
+            f"за {wall:.1f} с")
+
+        if options["output"]:
+            report = {"meta": self.meta(options), "requests": results}
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f"Результаты записаны в {options['output']}"))
+
+        problems = []
+        for name, (expected, status) in failures.items():
+            problems.append(f"{name}: статус {status}, ожидался {expected}")
+        if options["baseline"]:
+            problems += self.compare(results, options)
+        if problems:
+            for problem in problems:
+                self.stderr.write(problem)
+            raise CommandError(f"Проблем: {len(problems)}.")
+        self.stdout.write(self.style.SUCCESS("Регрессий нет."))
+
+    def worker_variables(self, variables, number):
+        if not number:
+            return dict(variables)
+        worker = dict(variables)
+        for key, value in variables.items():
+            if PER_WORKER.match(key):
+                quote = '"' if value.startswith('"') else ""
+                worker[key] = f"{quote}w{number}-{value[len(quote):]}"
+        return worker
+
+    def collection_usernames(self, workers):
+        """Пользователи, которых создаёт коллекция, — для сброса базы."""
+        usernames = set()
+        try:
+            script = (COLLECTION_DIR / "clear_db.sh").read_text(
+                encoding="utf-8")
+            match = CLEAR_USERNAMES.search(script)
+            if match:
+                usernames.update(re.findall(r"'([^']*)'", match.group(1)))
+        except OSError:
+            pass
+        for variables in workers:
+            for key, value in variables.items():
+                if key.lower().endswith("username"):
+                    usernames.add(value.strip('"'))
+        return usernames
+
+    def reset(self):
+        User.objects.filter(username__in=self.usernames).delete()
+
+    def replay(self, requests, variables):
+        """Выполняет коллекцию по порядку, выдаёт (имя, замер)."""
+        client = None if self.base_url else test_client(
+            raise_request_exception=False)
+        try:
+            for request in requests:
+                elapsed, status, queries, content = self.send(
+                    client, request, variables)
+                if request["setters"]:
+                    self.extract(request, content, variables)
+                yield request["name"], (
+                    elapsed, status, request["expected"], queries)
+        finally:
+            connection.close()
+
+    def extract(self, request, content, variables):
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return
+        for name, expression in request["setters"]:
+            value = resolve(expression, data, request["aliases"])
+            if value not in (None, ""):
+                variables[name] = value
+
+    def headers(self, request, variables):
+        headers = dict(request["headers"])
+        auth = request["auth"] or {}
+        if auth.get("type") == "apikey":
+            params = {param["key"]: param["value"]
+                      for param in auth.get("apikey", ())}
+            headers[params.get("key", "Authorization")] = params.get(
+                "value", "")
+        if request["body"] is not None:
+            headers.setdefault("Content-Type", "application/json")
+        return {key: substitute(value, variables)
+                for key, value in headers.items()}
+
+    def send(self, client, request, variables):
+        """Возвращает (секунды, статус, число SQL-запросов, тело ответа)."""
+        url = substitute(request["url"], variables)
+        headers = self.headers(request, variables)
+        body = request["body"]
+        if body is not None:
+            body = substitute(body, variables).encode()
+        if self.base_url:
+            started = time.perf_counter()
+            try:
+                with urlopen(Request(url, data=body, headers=headers,
+                                     method=request["method"])) as response:
+                    content = response.read()
+                    status = response.status
+                    timing = response.headers.get("Server-Timing", "")
+            except HTTPError as error:
+                content, status = error.read(), error.code
+                timing = error.headers.get("Server-Timing", "")
+            elapsed = time.perf_counter() - started
+            match = SERVER_TIMING_QUERIES.search(timing)
+            return (elapsed, status, int(match.group(1)) if match else None,
+                    content)
+
+        content_type = headers.pop("Content-Type", "application/json")
+        extra = {"HTTP_" + key.upper().replace("-", "_"): value
+                 for key, value in headers.items()}
+        queries = []
+        started = time.perf_counter()
+        with connection.execute_wrapper(
+                lambda execute, *args: queries.append(1) or execute(*args)):
+            response = client.generic(
+                request["method"], url, data=body or b"",
+                content_type=content_type, **extra)
+            if getattr(response, "streaming", False):
+                content = b"".join(response.streaming_content)
+            else:
+                content = response.content
+        return (time.perf_counter() - started, response.status_code,
+                len(queries), content)
+
+    def summary(self, samples):
+        latencies = sorted(elapsed * 1000 for elapsed, _, _, _ in samples)
+        queries = [count for _, _, _, count in samples if count is not None]
+        return {
+            "requests": len(samples),
+            "status": statistics.mode(status for _, status, _, _ in samples),
+            "expected": samples[0][2],
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "queries": (round(statistics.median(queries), 1)
+                        if queries else None),
+        }
+
+    def report(self, name, result):
+        queries = result["queries"]
+        self.stdout.write(
+            f"{name[:72]:<72} {result['status']} "
+            f"p50 {result['p50_ms']:>8.2f} мс  "
+            f"p95 {result['p95_ms']:>8.2f} мс  "
+            f"SQL {queries if queries is not None else '—'}")
+
+    def compare(self, results, options):
+        """Запросы, ставшие медленнее или сделавшие больше SQL-запросов."""
+        try:
+            with open(options["baseline"], encoding="utf-8") as file:
+                baseline = json.load(file)
+            meta, baseline = baseline.get("meta", {}), baseline["requests"]
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(
+                f"Не удалось прочитать базовый прогон: {error}")
+        for key in ("mode", "database", "parallel"):
+            if key in meta and meta[key] != self.meta(options)[key]:
+                self.stderr.write(self.style.WARNING(
+                    f"Базовый прогон снят с {key}={meta[key]}, "
+                    "сравнение может быть неточным."))
+        problems = []
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            latency, base_latency = result["p50_ms"], base["p50_ms"]
+            if (latency > base_latency * (1 + options["latency_tolerance"])
+                    and latency - base_latency > options["latency_slack_ms"]):
+                problems.append(
+                    f"{name}: медиана {latency:.2f} мс, "
+                    f"было {base_latency:.2f} мс")
+            queries, base_queries = result["queries"], base.get("queries")
+            if (queries is not None and base_queries is not None
+                    and queries > base_queries + options["query_tolerance"]):
+                problems.append(
+                    f"{name}: SQL-запросов {queries}, было {base_queries}")
+        return problems
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "HEAD"], capture_output=True,
+                text=True, cwd=settings.BASE_DIR, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            "commit": commit,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "mode": "server" if self.base_url else "test_client",
+            "database": connection.vendor,
+            "repeat": options["repeat"],
+            "parallel": options["parallel"],
+        }
@@ -0,0 +1,156 @@
+import os
+import shutil
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.constants import IMAGE_TYPES
+from recipes.models import Recipe
+
+User = get_user_model()
+
+FIELDS = ((Recipe, "image"), (User, "avatar"))
+DERIVATIVES = "derivatives"
+STEMS_PER_QUERY = 100
+# Multipart-загрузки сохраняют расширение из имени файла, поэтому
+# кроме IMAGE_TYPES встречаются .jpg и файлы без расширения.
+EXTENSIONS = ("",) + tuple(f".{ext}" for ext in IMAGE_TYPES + ("jpg",))
+
+
+def scan(root, directory):
+    """
+    Обходит каталог через os.scandir, не собирая списков файлов:
+    в памяти держится только стек ещё не просмотренных подкаталогов.
+    """
+    stack = [os.path.join(root, directory)]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def referenced_names(names):
+    found = set()
+    for model, field in FIELDS:
+        found.update(
+            model.objects.filter(**{f"{field}__in": names})
+            .values_list(field, flat=True).iterator())
+    return found
+
+
+def referenced_stems(stems):
+    """
+    Сверяет основы имён с базой одним условием image__in по всем
+    возможным расширениям вместо сотни условий LIKE.
+    """
+    found = set()
+    for part in chunks(stems, STEMS_PER_QUERY):
+        names = [stem + ext for stem in part for ext in EXTENSIONS]
+        found.update(
+            os.path.splitext(name)[0] for name in referenced_names(names))
+    return found
+
+
+def derivative_stem(relative):
+    """derivatives/recipes/ab/abcd/card.webp -> recipes/ab/abcd"""
+    return os.path.dirname(os.path.relpath(relative, DERIVATIVES))
+
+
+class Command(BaseCommand):
+    help = ("Удаляет из MEDIA_ROOT изображения и их уменьшенные копии, "
+            "на которые не ссылаются рецепты и пользователи.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только показать неиспользуемые файлы, ничего не удалять.")
+        parser.add_argument(
+            "--quarantine", metavar="DIR",
+            help="Переносить файлы в указанный каталог вместо удаления.")
+        parser.add_argument(
+            "--min-age", type=int, default=3600,
+            help="Не трогать файлы моложе указанного числа секунд "
+                 "(загрузки, ещё не сохранённые в базе).")
+        parser.add_argument(
+            "--chunk-size", type=int, default=1000,
+            help="Сколько файлов сверять с базой за один запрос.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.root = str(settings.MEDIA_ROOT)
+        self.quarantine = (os.path.abspath(options["quarantine"])
+                           if options["quarantine"] else None)
+        self.cutoff = time.time() - options["min_age"]
+        self.found = self.size = 0
+        for model, field in FIELDS:
+            directory = model._meta.get_field(field).upload_to.strip("/")
+            self.sweep(directory, referenced_names, lambda name: name)
+            self.sweep(os.path.join(DERIVATIVES, directory),
+                       referenced_stems, derivative_stem)
+
+        summary = (f"Неиспользуемых файлов: {self.found}, "
+                   f"{self.size / 1024 / 1024:.1f} МБ.")
+        if options["dry_run"] or not self.found:
+            self.stdout.write(summary)
+        elif self.quarantine:
+            self.stdout.write(self.style.SUCCESS(
+                f"{summary} Перенесены в {self.quarantine}."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{summary} Удалены."))
+
+    def sweep(self, directory, referenced, key):
+        for chunk in chunks(self.candidates(directory),
+                            self.options["chunk_size"]):
+            keys = {key(relative) for entry, relative in chunk}
+            used = referenced(list(keys))
+            for entry, relative in chunk:
+                if key(relative) not in used:
+                    self.remove(entry, relative)
+
+    def candidates(self, directory):
+        for entry in scan(self.root, directory):
+            if (self.quarantine
+                    and entry.path.startswith(self.quarantine + os.sep)):
+                continue
+            if entry.stat(follow_symlinks=False).st_mtime > self.cutoff:
+                continue
+            relative = os.path.relpath(entry.path, self.root)
+            yield entry, relative.replace(os.sep, "/")
+
+    def remove(self, entry, relative):
+        self.found += 1
+        self.size += entry.stat(follow_symlinks=False).st_size
+        if self.options["dry_run"] or self.options["verbosity"] > 1:
+            self.stdout.write(relative)
+        if self.options["dry_run"]:
+            return
+        if self.quarantine:
+            target = os.path.join(self.quarantine, relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(entry.path, target)
+        else:
+            os.remove(entry.path)
+        if relative.startswith(f"{DERIVATIVES}/"):
+            try:
+                os.rmdir(os.path.dirname(entry.path))
+            except OSError:
+                pass
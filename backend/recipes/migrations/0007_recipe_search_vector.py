@@ -0,0 +1,48 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:15
+
+import django.contrib.postgres.search
+import recipes.models
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ingredients = Coalesce(models.Subquery(
+        RecipeIngredient.objects
+        .filter(recipe_id=models.OuterRef('pk'))
+        .order_by()
+        .values('recipe_id')
+        .annotate(names=StringAgg('ingredient__name', ' '))
+        .values('names')
+    ), models.Value(''))
+    Recipe.objects.update(search_vector=(
+        SearchVector('name', weight='A', config='russian')
+        + SearchVector(ingredients, weight='B', config='russian')
+        + SearchVector('text', weight='C', config='russian')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=recipes.models.SearchVectorIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+    ]
@@ -1,16 +1,44 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 
 from api.constants import (IMAGE_UPLOAD_RECIPE, MAX_ING_NAME,
                            MAX_MEASUREMENT_UNIT, MAX_RECIPE_NAME,
                            MAX_SLUG_LENGTH, MAX_TAG_NAME, MIN_AMOUNT,
                            MIN_COOK_TIME)
+from recipes.cache import (bump_versions_on_commit, cart_version_name,
+                           favorites_version_name)
 
 User = get_user_model()
 
 
+class SearchVectorIndex(GinIndex):
+    """
+    GIN-индекс поискового вектора. На других базах (SQLite в разработке
+    и тестах) вектор не заполняется, и вместо GIN создаётся обычный
+    индекс, чтобы миграции проходили.
+    """
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor == "postgresql":
+            return super().create_sql(
+                model, schema_editor, using=using, **kwargs)
+        return models.Index.create_sql(
+            self, model, schema_editor, using=using, **kwargs)
+
+
+def lock_users(user_ids):
+    """
+    Блокирует строки пользователей до конца транзакции. Порядок по pk
+    одинаков у всех транзакций, поэтому они не ждут друг друга по кругу.
+    """
+    list(User.objects.select_for_update().filter(pk__in=user_ids)
+         .order_by("pk").values_list("pk", flat=True))
+
+
 class Tag(models.Model):
     name = models.CharField(
         "Название тега",
@@ -57,6 +85,36 @@ class Ingredient(models.Model):
         return f"{self.name} ({self.measurement_unit})"
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related("author").prefetch_related(
+            models.Prefetch(
+                "recipe_ingredients",
+                queryset=RecipeIngredient.objects.select_related("ingredient"),
+            ),
+            "tags",
+        )
+
+    def with_user_flags(self, user):
+        from users.models import Subscription
+
+        if not user.is_authenticated:
+            false = models.Value(False, output_field=models.BooleanField())
+            return self.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                is_author_subscribed=false,
+            )
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef("pk"))),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef("pk"))),
+            is_author_subscribed=models.Exists(Subscription.objects.filter(
+                user=user, author=models.OuterRef("author"))),
+        )
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -103,12 +161,39 @@ class Recipe(models.Model):
         "Дата обновления",
         auto_now=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        "В избранном",
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        "В корзинах",
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        "Поисковый вектор",
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         default_related_name = "recipes"
         ordering = ("-created",)
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        indexes = [
+            models.Index(fields=["-created", "-id"],
+                         name="recipe_created_id_idx"),
+            models.Index(fields=["-favorites_count"],
+                         name="recipe_favorites_count_idx"),
+            models.Index(fields=["author", "-created", "-id"],
+                         name="recipe_author_created_idx"),
+            SearchVectorIndex(fields=["search_vector"],
+                              name="recipe_search_vector_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -144,6 +229,10 @@ class RecipeIngredient(models.Model):
     class Meta:
         verbose_name = "Ингредиент в рецепте"
         verbose_name_plural = "Ингредиенты в рецептах"
+        indexes = [
+            models.Index(fields=["ingredient", "recipe"],
+                         name="ingredient_recipe_idx"),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["recipe", "ingredient"],
@@ -155,6 +244,98 @@ class RecipeIngredient(models.Model):
         return f"{self.ingredient.name} в «{self.recipe.name}»: {self.amount}"
 
 
+class UserRecipeQuerySet(models.QuerySet):
+    """
+    Добавление и удаление рецептов пользователя списком. Избранное
+    и корзина меняются только через методы этого класса (API, админка,
+    удаление рецептов и пользователей): счётчики, список покупок
+    и версии кеша обновляются в changed() и recipe_deleted(). Сигналов
+    у этих моделей нет, поэтому строки пишутся одним INSERT и одним
+    DELETE. Строка пользователя блокируется, так что повторные запросы
+    не гоняются друг с другом.
+    """
+    counter_field = None
+
+    def add(self, user, recipe_ids):
+        """Возвращает id рецептов, которых у пользователя ещё не было."""
+        with transaction.atomic():
+            lock_users([user.pk])
+            existing = set(self.filter(
+                user=user, recipe_id__in=recipe_ids,
+            ).values_list("recipe_id", flat=True))
+            added = [pk for pk in dict.fromkeys(recipe_ids)
+                     if pk not in existing]
+            if added:
+                self.bulk_create(
+                    [self.model(user=user, recipe_id=pk) for pk in added],
+                    ignore_conflicts=True,
+                )
+                self.changed(user.pk, added, 1)
+        return added
+
+    def remove(self, user, recipe_ids):
+        """Возвращает id рецептов, которые действительно были удалены."""
+        with transaction.atomic():
+            lock_users([user.pk])
+            removed = list(self.filter(
+                user=user, recipe_id__in=recipe_ids,
+            ).values_list("recipe_id", flat=True))
+            if removed:
+                self.filter(user=user, recipe_id__in=removed).delete()
+                self.changed(user.pk, removed, -1)
+        return removed
+
+    def clear(self, user):
+        """Убирает все рецепты пользователя, например перед его удалением."""
+        return self.remove(user, list(
+            self.filter(user=user).values_list("recipe_id", flat=True)))
+
+    def changed(self, user_id, recipe_ids, sign):
+        Recipe.objects.filter(pk__in=recipe_ids).update(**{
+            self.counter_field: models.F(self.counter_field) + sign})
+
+    def recipe_deleted(self, recipe_id):
+        """
+        Вызывается перед удалением рецепта: строки удалит каскад,
+        а здесь обновляется то, что от них зависит. Возвращает id
+        пользователей, у которых был рецепт.
+        """
+        return list(self.filter(recipe_id=recipe_id)
+                    .values_list("user_id", flat=True))
+
+
+class FavoriteQuerySet(UserRecipeQuerySet):
+    counter_field = "favorites_count"
+
+    def changed(self, user_id, recipe_ids, sign):
+        super().changed(user_id, recipe_ids, sign)
+        bump_versions_on_commit(favorites_version_name(user_id))
+
+    def recipe_deleted(self, recipe_id):
+        user_ids = super().recipe_deleted(recipe_id)
+        bump_versions_on_commit(
+            *(favorites_version_name(user_id) for user_id in user_ids))
+        return user_ids
+
+
+class ShoppingCartQuerySet(UserRecipeQuerySet):
+    counter_field = "in_carts_count"
+
+    def changed(self, user_id, recipe_ids, sign):
+        super().changed(user_id, recipe_ids, sign)
+        ShoppingListItem.objects.add_recipes(user_id, recipe_ids, sign)
+        bump_versions_on_commit(cart_version_name(user_id))
+
+    def recipe_deleted(self, recipe_id):
+        user_ids = super().recipe_deleted(recipe_id)
+        ShoppingListItem.objects.update_recipe(recipe_id, dict(
+            RecipeIngredient.objects.filter(recipe_id=recipe_id)
+            .values_list("ingredient_id", "amount")), {})
+        bump_versions_on_commit(
+            *(cart_version_name(user_id) for user_id in user_ids))
+        return user_ids
+
+
 class UserRecipeRelation(models.Model):
     """
     Абстрактная базовая модель для отношений User–Recipe:
@@ -183,6 +364,8 @@ class Favorite(UserRecipeRelation):
         verbose_name='Рецепт',
     )
 
+    objects = FavoriteQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Избранное"
         verbose_name_plural = "Избранное"
@@ -206,6 +389,8 @@ class ShoppingCart(UserRecipeRelation):
         verbose_name='Рецепт',
     )
 
+    objects = ShoppingCartQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Корзина"
         verbose_name_plural = "Корзина"
@@ -220,6 +405,99 @@ class ShoppingCart(UserRecipeRelation):
         return f"{self.user} добавил(а) «{self.recipe}» в корзину"
 
 
+class ShoppingListQuerySet(models.QuerySet):
+    def apply_deltas(self, user_ids, deltas):
+        """
+        Прибавляет к итогам пользователей изменения {ingredient_id: amount}.
+        Строки с неположительным итогом удаляются.
+        """
+        user_ids = list(user_ids)
+        deltas = {pk: amount for pk, amount in deltas.items() if amount}
+        if not user_ids or not deltas:
+            return
+        with transaction.atomic():
+            lock_users(user_ids)
+            rows = self.filter(user_id__in=user_ids, ingredient_id__in=deltas)
+            existing = set(rows.values_list("user_id", "ingredient_id"))
+            if existing:
+                rows.update(total=models.F("total") + models.Case(
+                    *(models.When(ingredient_id=pk, then=models.Value(amount))
+                      for pk, amount in deltas.items()),
+                    default=models.Value(0),
+                    output_field=models.IntegerField(),
+                ))
+            self.bulk_create(
+                self.model(user_id=user_id, ingredient_id=pk, total=amount)
+                for user_id in user_ids
+                for pk, amount in deltas.items()
+                if amount > 0 and (user_id, pk) not in existing
+            )
+            rows.filter(total__lte=0).delete()
+
+    def add_recipes(self, user_id, recipe_ids, sign=1):
+        amounts = (
+            RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+            .order_by()
+            .values("ingredient_id")
+            .annotate(amount=models.Sum("amount"))
+            .values_list("ingredient_id", "amount")
+        )
+        self.apply_deltas(
+            [user_id], {pk: sign * amount for pk, amount in amounts})
+
+    def add_recipe(self, user_id, recipe_id, sign=1):
+        self.add_recipes(user_id, [recipe_id], sign)
+
+    def remove_recipe(self, user_id, recipe_id):
+        self.add_recipe(user_id, recipe_id, sign=-1)
+
+    def update_recipe(self, recipe_id, old_amounts, new_amounts):
+        """Переносит изменение состава рецепта в корзины с этим рецептом."""
+        deltas = {
+            pk: new_amounts.get(pk, 0) - old_amounts.get(pk, 0)
+            for pk in old_amounts.keys() | new_amounts.keys()
+        }
+        user_ids = ShoppingCart.objects.filter(
+            recipe_id=recipe_id).values_list("user_id", flat=True)
+        self.apply_deltas(user_ids, deltas)
+
+
+class ShoppingListItem(models.Model):
+    """
+    Итог по ингредиенту в списке покупок пользователя.
+    Поддерживается инкрементально при изменении корзины
+    и состава рецептов; сверяется командой rebuild_shopping_lists.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shopping_list",
+        verbose_name="Пользователь",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Ингредиент",
+    )
+    total = models.IntegerField("Количество")
+
+    objects = ShoppingListQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Позиция списка покупок"
+        verbose_name_plural = "Список покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_shopping_list_item"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.ingredient} — {self.total}"
+
+
 class TagInRecipe(models.Model):
     tag = models.ForeignKey(
         Tag,
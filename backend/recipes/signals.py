@@ -0,0 +1,163 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from recipes.cache import (bump_versions_on_commit, cart_version_name,
+                           subscriptions_version_name)
+from recipes.images import schedule_derivatives
+from recipes.indexes.matrix import recipe_matrix
+from recipes.indexes.search import get_backend as get_search_backend
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag, TagInRecipe)
+from users.models import Subscription
+
+User = get_user_model()
+
+
+def increment(model, pk, field, signal, created=False):
+    """Увеличивает счётчик при создании строки и уменьшает при удалении."""
+    if signal is post_delete:
+        delta = -1
+    elif created:
+        delta = 1
+    else:
+        return
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def bump_carts_with_recipes(recipe_ids):
+    user_ids = ShoppingCart.objects.filter(
+        recipe_id__in=recipe_ids).values_list("user_id", flat=True).distinct()
+    bump_versions_on_commit(
+        *(cart_version_name(user_id) for user_id in user_ids))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    bump_versions_on_commit("ingredients", "recipes")
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    bump_versions_on_commit("tags", "recipes")
+
+
+# Состав рецепта (RecipeIngredient) меняется только вместе с сохранением
+# рецепта — в сериализаторе и в админке, — поэтому версии, матрица
+# и корзины обновляются по сигналам Recipe. Без своих сигналов строки
+# состава удаляются одним DELETE, без запроса на каждую строку.
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=TagInRecipe)
+def bump_recipes_version(sender, **kwargs):
+    bump_versions_on_commit("recipes")
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=TagInRecipe)
+def update_recipe_matrix(sender, instance, **kwargs):
+    recipe_id = instance.pk if sender is Recipe else instance.recipe_id
+    transaction.on_commit(lambda: recipe_matrix.update([recipe_id]))
+
+
+@receiver((post_save, post_delete), sender=User)
+def bump_recipes_version_on_author_change(sender, update_fields=None,
+                                          **kwargs):
+    if update_fields is None or set(update_fields) != {"last_login"}:
+        bump_versions_on_commit("recipes")
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def bump_subscriptions_version(sender, instance, **kwargs):
+    bump_versions_on_commit(
+        subscriptions_version_name(instance.user_id))
+
+
+@receiver(post_save, sender=Recipe)
+def bump_carts_on_recipe_save(sender, instance, created, **kwargs):
+    if not created:
+        bump_carts_with_recipes([instance.pk])
+
+
+@receiver(pre_delete, sender=Ingredient)
+def forget_deleted_ingredient(sender, instance, **kwargs):
+    # Строки состава удаляются каскадом, без сигналов.
+    recipe_ids = list(RecipeIngredient.objects.filter(
+        ingredient=instance).values_list("recipe_id", flat=True))
+    if recipe_ids:
+        bump_carts_with_recipes(recipe_ids)
+        transaction.on_commit(lambda: recipe_matrix.update(recipe_ids))
+
+
+# Избранное и корзина меняются через методы их менеджеров
+# (UserRecipeQuerySet); каскадное удаление идёт через них же.
+@receiver(pre_delete, sender=Recipe)
+def forget_deleted_recipe(sender, instance, **kwargs):
+    Favorite.objects.recipe_deleted(instance.pk)
+    ShoppingCart.objects.recipe_deleted(instance.pk)
+
+
+@receiver(pre_delete, sender=User)
+def clear_deleted_user_recipes(sender, instance, **kwargs):
+    Favorite.objects.clear(instance)
+    ShoppingCart.objects.clear(instance)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def update_recipes_count(sender, instance, signal, created=False, **kwargs):
+    increment(User, instance.author_id, "recipes_count", signal, created)
+
+
+IMAGE_FIELDS = {Recipe: "image", User: "avatar"}
+
+
+def stored_image_name(instance, field):
+    """Имя файла без обращения к дескриптору; None, если поле отложено."""
+    value = instance.__dict__.get(field)
+    return getattr(value, "name", value)
+
+
+@receiver(post_init, sender=Recipe)
+@receiver(post_init, sender=User)
+def remember_image_name(sender, instance, **kwargs):
+    instance._saved_image_name = stored_image_name(
+        instance, IMAGE_FIELDS[sender])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def generate_image_derivatives(sender, instance, created, update_fields=None,
+                               **kwargs):
+    field = IMAGE_FIELDS[sender]
+    if update_fields is not None and field not in update_fields:
+        return
+    name = stored_image_name(instance, field)
+    # Смена пароля или профиля не трогает картинку — копии не нужны.
+    if created or name != instance._saved_image_name:
+        schedule_derivatives(name)
+        instance._saved_image_name = name
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_index(sender, instance, **kwargs):
+    # После коммита: при создании ингредиенты записываются позже рецепта.
+    transaction.on_commit(lambda: get_search_backend().update([instance.pk]))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_search_index(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: get_search_backend().remove([pk]))
+
+
+@receiver(post_save, sender=Ingredient)
+def update_search_index_on_ingredient(sender, instance, created, **kwargs):
+    if created:
+        return
+    recipe_ids = list(RecipeIngredient.objects.filter(
+        ingredient=instance).values_list("recipe_id", flat=True))
+    if recipe_ids:
+        transaction.on_commit(
+            lambda: get_search_backend().update(recipe_ids))
@@ -16,14 +16,8 @@ class UserAdmin(BaseUserAdmin):
     )
     search_fields = ("email", "username")
     list_filter = ("email", "username", "first_name", "last_name")
-
-    @admin.display(description="Рецептов")
-    def recipes_count(self, obj):
-        return obj.recipes.count()
-
-    @admin.display(description="Подписчиков")
-    def subscribers_count(self, obj):
-        return obj.subscribers.count()
+    readonly_fields = (
+        "recipes_count", "subscribers_count", "subscriptions_count")
 
 
 @admin.register(Subscription)
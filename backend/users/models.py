@@ -11,6 +11,12 @@ class User(AbstractUser):
         verbose_name="Аватар",
     )
     email = models.EmailField("Почта", unique=True)
+    recipes_count = models.PositiveIntegerField(
+        "Рецептов", default=0, editable=False)
+    subscribers_count = models.PositiveIntegerField(
+        "Подписчиков", default=0, editable=False)
+    subscriptions_count = models.PositiveIntegerField(
+        "Подписок", default=0, editable=False)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = [
@@ -27,19 +33,15 @@ class User(AbstractUser):
         return self.username
 
     def get_shopping_list(self):
-        from recipes.models import RecipeIngredient
-
-        ingredient_qs = (
-            RecipeIngredient.objects
-            .filter(recipe__in_carts__user=self)
-            .annotate(
+        return (
+            self.shopping_list
+            .values(
+                "total",
                 name=models.F("ingredient__name"),
                 measurement_unit=models.F("ingredient__measurement_unit"),
-                total=models.Sum("amount"),
             )
-            .values("name", "measurement_unit", "total")
+            .order_by("name", "measurement_unit")
         )
-        return list(ingredient_qs)
 
 
 class Subscription(models.Model):
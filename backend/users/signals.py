@@ -0,0 +1,29 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from config.db_router import stick_to_primary
+from users.models import Subscription, User
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def update_subscription_counters(sender, instance, signal, created=False,
+                                 **kwargs):
+    if signal is post_delete:
+        delta = -1
+    elif created:
+        delta = 1
+    else:
+        return
+    User.objects.filter(pk=instance.author_id).update(
+        subscribers_count=F("subscribers_count") + delta)
+    User.objects.filter(pk=instance.user_id).update(
+        subscriptions_count=F("subscriptions_count") + delta)
+
+
+@receiver(post_save, sender=Token)
+def stick_new_token_to_primary(sender, instance, created, **kwargs):
+    """Новый токен может ещё не дойти до реплик."""
+    if created:
+        stick_to_primary(f"Token {instance.key}")